@@ -0,0 +1,124 @@
+"""adaptive anti-aliasing
+
+After one ray per pixel only the pixels on an edge, where a neighbour hit a
+different triangle or has a clearly different color, get extra stratified
+samples. The sample budget caps the extra rays per frame, the strongest edges
+are refined first.
+"""
+import numpy as np
+
+# extra samples per edge pixel are SAMPLES_PER_AXIS squared strata
+SAMPLES_PER_AXIS = 2
+# largest per channel color difference between neighbours that is no edge
+COLOR_THRESHOLD = 0.1
+# priority of a triangle edge over any color difference
+TRIANGLE_EDGE_WEIGHT = 1.0
+
+
+def edge_strength(tri_indices, colors, threshold=COLOR_THRESHOLD):
+    """per pixel edge strength of an (h, w) triangle id and (h, w, 3) color
+    frame, 0 for pixels that are not on an edge
+
+    a pixel is an edge when its right or bottom neighbour hit another triangle
+    or differs more than threshold in a color channel, both pixels of the pair
+    are marked
+    """
+    strength = np.zeros(tri_indices.shape)
+    for axis in (0, 1):
+        first = [slice(None), slice(None)]
+        second = [slice(None), slice(None)]
+        first[axis] = slice(None, -1)
+        second[axis] = slice(1, None)
+        first = tuple(first)
+        second = tuple(second)
+
+        delta = np.abs(colors[first] - colors[second]).max(axis=-1)
+        pair = np.where(delta > threshold, delta, 0.0)
+        pair += np.where(tri_indices[first] != tri_indices[second],
+                         TRIANGLE_EDGE_WEIGHT, 0.0)
+        np.maximum(strength[first], pair, out=strength[first])
+        np.maximum(strength[second], pair, out=strength[second])
+    return strength
+
+
+def stratified_offsets(total_pixels, samples_per_axis, rng):
+    """(n, s, 2) jittered sub pixel offsets in [0, 1), one sample in each of
+    the s = samples_per_axis ** 2 strata of every pixel
+    """
+    cells = np.arange(samples_per_axis, dtype=np.float64) / samples_per_axis
+    grid_x, grid_y = np.meshgrid(cells, cells)
+    strata = np.column_stack((grid_x.ravel(), grid_y.ravel()))
+    jitter = rng.random((total_pixels, len(strata), 2)) / samples_per_axis
+    return strata[None, :, :] + jitter
+
+
+class AdaptiveSampler(object):
+    """refines the edges of a one ray per pixel frame with extra samples
+
+    budget is the maximum amount of extra primary rays per frame, None for no
+    limit. The jitter is seeded the same every frame so an animation does not
+    flicker.
+    """
+
+    def __init__(self, samples_per_axis=SAMPLES_PER_AXIS,
+                 threshold=COLOR_THRESHOLD, budget=None, seed=0):
+        self.samples_per_axis = samples_per_axis
+        self.threshold = threshold
+        self.budget = budget
+        self.seed = seed
+        # statistics of the last frame
+        self.edge_pixels = 0
+        self.refined_pixels = 0
+        self.extra_rays = 0
+
+    @property
+    def samples_per_pixel(self):
+        return self.samples_per_axis * self.samples_per_axis
+
+    def select_pixels(self, strength):
+        """flat indices of the edge pixels to refine, strongest first when the
+        budget does not cover all of them
+        """
+        strength = strength.ravel()
+        pixels = np.flatnonzero(strength)
+        self.edge_pixels = len(pixels)
+        if self.budget is None:
+            return pixels
+        max_pixels = max(self.budget // self.samples_per_pixel, 0)
+        if len(pixels) <= max_pixels:
+            return pixels
+        order = np.argsort(-strength[pixels], kind='stable')
+        return np.sort(pixels[order[:max_pixels]])
+
+    def refine(self, colors, tri_indices, screen_to_rays, trace):
+        """anti-alias the (h, w, 3) colors in place
+
+        screen_to_rays maps arrays of screen x and y to (n, 3) ray origins and
+        directions, trace maps those rays to (n, 3) colors
+        """
+        height, width = tri_indices.shape
+        strength = edge_strength(tri_indices, colors, self.threshold)
+        pixels = self.select_pixels(strength)
+        self.refined_pixels = len(pixels)
+        self.extra_rays = len(pixels) * self.samples_per_pixel
+        if not len(pixels):
+            return colors
+
+        rng = np.random.default_rng(self.seed)
+        offsets = stratified_offsets(len(pixels), self.samples_per_axis, rng)
+        pixel_y, pixel_x = np.divmod(pixels, width)
+        sample_x = pixel_x[:, None] + offsets[:, :, 0]
+        sample_y = pixel_y[:, None] + offsets[:, :, 1]
+        screen_x = sample_x / width * 2.0 - 1.0
+        screen_y = (sample_y / height * 2.0 - 1.0) * -1
+
+        origins, directions = screen_to_rays(screen_x.ravel(),
+                                             screen_y.ravel())
+        samples = trace(origins, directions).reshape(
+            len(pixels), self.samples_per_pixel, 3)
+
+        # the pixel center ray counts as one more sample
+        flat_colors = colors.reshape(-1, 3)
+        flat_colors[pixels] = ((flat_colors[pixels] + samples.sum(axis=1)) /
+                               (self.samples_per_pixel + 1))
+        return colors
@@ -0,0 +1,344 @@
+"""batched ray tracing on contiguous numpy arrays
+
+Intersects whole arrays of rays against every triangle of the scene at once
+(Moller-Trumbore) and shades the hits the same way RayTracer.render_tri does.
+"""
+import time
+
+import numpy as np
+
+EPSILON = 0.0000001
+AMBIENT_STRENGTH = 0.2
+BACKGROUND_COLOR = (0.3, 0.3, 0.3)
+NO_HIT = -1
+
+# upper bound of ray * triangle pairs tested in one array pass
+MAX_CHUNK_ELEMENTS = 1 << 20
+
+
+def normalize(vectors):
+    """normalize an (n, 3) array, zero length vectors stay zero
+    """
+    lengths = np.sqrt(np.einsum('ij,ij->i', vectors, vectors))
+    lengths[lengths == 0.0] = 1.0
+    return vectors / lengths[:, None]
+
+
+def reflect(vectors, normals):
+    """reflect (n, 3) vectors around (n, 3) normals
+    """
+    dot = np.einsum('ij,ij->i', vectors, normals)
+    return vectors - normals * (2.0 * dot)[:, None]
+
+
+class TriangleBatch(object):
+    """world space triangles of a scene packed in contiguous float arrays
+    """
+
+    def __init__(self, v0, v1, v2, normals, geometry_ids):
+        self.v0 = np.ascontiguousarray(v0, dtype=np.float64).reshape(-1, 3)
+        self.v1 = np.ascontiguousarray(v1, dtype=np.float64).reshape(-1, 3)
+        self.v2 = np.ascontiguousarray(v2, dtype=np.float64).reshape(-1, 3)
+        # object space normals, used for the diffuse term like render_tri
+        self.normals = np.ascontiguousarray(normals,
+                                            dtype=np.float64).reshape(-1, 3)
+        self.geometry_ids = np.ascontiguousarray(geometry_ids, dtype=np.int64)
+        self.edge1 = self.v1 - self.v0
+        self.edge2 = self.v2 - self.v0
+        self.cross_edges = np.cross(self.edge1, self.edge2)
+        self.world_normals = normalize(self.cross_edges)
+        self.v0_cross_edge1 = np.cross(self.v0, self.edge1)
+        self.v0_cross_edge2 = np.cross(self.v0, self.edge2)
+        self.v0_dot_normal = np.einsum('ij,ij->i', self.v0, self.cross_edges)
+
+    def __len__(self):
+        return len(self.v0)
+
+    def take(self, indices):
+        """new batch holding the given triangles in the given order
+        """
+        return TriangleBatch(self.v0[indices], self.v1[indices],
+                             self.v2[indices], self.normals[indices],
+                             self.geometry_ids[indices])
+
+    def bounds(self):
+        """per triangle axis aligned (min, max) arrays
+        """
+        return (np.minimum(np.minimum(self.v0, self.v1), self.v2),
+                np.maximum(np.maximum(self.v0, self.v1), self.v2))
+
+    def geometry_bounds(self, total_geometries):
+        """axis aligned (min, max) arrays of every geometry id
+        """
+        tri_min, tri_max = self.bounds()
+        geometry_min = np.full((total_geometries, 3), np.inf)
+        geometry_max = np.full((total_geometries, 3), -np.inf)
+        np.minimum.at(geometry_min, self.geometry_ids, tri_min)
+        np.maximum.at(geometry_max, self.geometry_ids, tri_max)
+        return geometry_min, geometry_max
+
+    def intersect(self, origins, directions, ignore_geometry=None,
+                  counters=None):
+        """nearest hit of every ray
+
+        returns distance, triangle index and barycentric u, v per ray,
+        triangle index is NO_HIT for rays that miss
+        """
+        total_rays = len(origins)
+        distance = np.full(total_rays, np.inf)
+        index = np.full(total_rays, NO_HIT, dtype=np.int64)
+        u = np.zeros(total_rays)
+        v = np.zeros(total_rays)
+        if not len(self) or not total_rays:
+            return distance, index, u, v
+
+        chunk = max(1, MAX_CHUNK_ELEMENTS // len(self))
+        for start in range(0, total_rays, chunk):
+            end = start + chunk
+            ignore = None if ignore_geometry is None else ignore_geometry[
+                                                          start:end]
+            t, hit_u, hit_v, valid = self._moller_trumbore(
+                origins[start:end], directions[start:end], ignore,
+                counters=counters)
+            t = np.where(valid, t, np.inf)
+            nearest = np.argmin(t, axis=1)
+            rows = np.arange(len(nearest))
+            nearest_t = t[rows, nearest]
+            hit = nearest_t != np.inf
+            distance[start:end] = nearest_t
+            index[start:end] = np.where(hit, nearest, NO_HIT)
+            u[start:end] = hit_u[rows, nearest]
+            v[start:end] = hit_v[rows, nearest]
+        return distance, index, u, v
+
+    def any_hit(self, origins, directions, ignore_geometry=None,
+                counters=None):
+        """distance and triangle index of any hit per ray, stops searching
+        a ray at its first hit when used through a BVH
+        """
+        total_rays = len(origins)
+        distance = np.full(total_rays, np.inf)
+        index = np.full(total_rays, NO_HIT, dtype=np.int64)
+        if not len(self) or not total_rays:
+            return distance, index
+
+        chunk = max(1, MAX_CHUNK_ELEMENTS // len(self))
+        for start in range(0, total_rays, chunk):
+            end = start + chunk
+            ignore = None if ignore_geometry is None else ignore_geometry[
+                                                          start:end]
+            t, _, _, valid = self._moller_trumbore(
+                origins[start:end], directions[start:end], ignore,
+                counters=counters)
+            first = np.argmax(valid, axis=1)
+            rows = np.arange(len(first))
+            hit = valid[rows, first]
+            distance[start:end] = np.where(hit, t[rows, first], np.inf)
+            index[start:end] = np.where(hit, first, NO_HIT)
+        return distance, index
+
+    def occluded(self, origins, directions, ignore_geometry=None,
+                 counters=None):
+        """True for every ray that hits any triangle
+        """
+        return self.any_hit(origins, directions,
+                            ignore_geometry=ignore_geometry,
+                            counters=counters)[1] != NO_HIT
+
+    def _moller_trumbore(self, origins, directions, ignore_geometry,
+                         start=0, end=None, counters=None):
+        # https://en.wikipedia.org/wiki/M%C3%B6ller%E2%80%93Trumbore_intersection_algorithm
+        # the per pair cross and dot products are rewritten with scalar triple
+        # products so every term is a (rays, 3) x (3, triangles) matmul.
+        # start and end restrict the test to a contiguous range of triangles
+        tris = slice(start, end)
+        a = -np.dot(directions, self.cross_edges[tris].T)
+        if counters is not None:
+            counters.triangle_tests += a.size
+        valid = (a <= -EPSILON) | (a >= EPSILON)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            f = 1.0 / np.where(valid, a, 1.0)
+        w = np.cross(directions, origins)
+        u = f * (np.dot(directions, self.v0_cross_edge2[tris].T) -
+                 np.dot(w, self.edge2[tris].T))
+        valid &= (u >= 0.0) & (u <= 1.0)
+
+        v = f * (np.dot(w, self.edge1[tris].T) -
+                 np.dot(directions, self.v0_cross_edge1[tris].T))
+        valid &= (v >= 0.0) & (u + v <= 1.0)
+
+        t = f * (np.dot(origins, self.cross_edges[tris].T) -
+                 self.v0_dot_normal[tris])
+        valid &= t > EPSILON
+        if ignore_geometry is not None:
+            valid &= self.geometry_ids[None, tris] != ignore_geometry[:, None]
+        return t, u, v, valid
+
+
+class SceneBatch(object):
+    """Qt free snapshot of everything needed to shade a frame
+    """
+
+    def __init__(self, triangles, geometry_colors, light_positions,
+                 light_colors, accelerator=None):
+        self.triangles = triangles
+        # anything with the intersect/occluded interface of TriangleBatch,
+        # e.g. a BVH built over the same triangles
+        self.accelerator = accelerator or triangles
+        self.geometry_colors = np.asarray(geometry_colors,
+                                          dtype=np.float64).reshape(-1, 3)
+        self.light_positions = np.asarray(light_positions,
+                                          dtype=np.float64).reshape(-1, 3)
+        self.light_colors = np.asarray(light_colors,
+                                       dtype=np.float64).reshape(-1, 3)
+
+
+class RayCounters(object):
+    """amount of rays of each kind cast while rendering, the ray triangle
+    tests and bounding box rejections they caused and the seconds spent per
+    render phase
+    """
+
+    def __init__(self):
+        self.primary = 0
+        self.shadow = 0
+        self.reflection = 0
+        self.triangle_tests = 0
+        self.bbox_rejections = 0
+        self.seconds = {}
+
+    def reset(self):
+        self.primary = 0
+        self.shadow = 0
+        self.reflection = 0
+        self.triangle_tests = 0
+        self.bbox_rejections = 0
+        self.seconds = {}
+
+    def add(self, other):
+        self.primary += other.primary
+        self.shadow += other.shadow
+        self.reflection += other.reflection
+        self.triangle_tests += other.triangle_tests
+        self.bbox_rejections += other.bbox_rejections
+        for phase, seconds in other.seconds.items():
+            self.add_time(phase, seconds)
+
+    def add_time(self, phase, seconds):
+        self.seconds[phase] = self.seconds.get(phase, 0.0) + seconds
+
+    @property
+    def total(self):
+        return self.primary + self.shadow + self.reflection
+
+
+def trace_rays(scene, origins, directions, shadows=True, reflections=True,
+               counters=None, record=None, hits=None):
+    """render the colors of (n, 3) ray origins and directions
+
+    the cast rays are added to counters when given. Every ray of the ray tree
+    of each primary ray is passed to record when given, see
+    shadowcache.RayRecord for the interface. hits is an optional (n,) int
+    array that receives the triangle index hit by every ray.
+    """
+    origins = np.asarray(origins, dtype=np.float64).reshape(-1, 3)
+    directions = np.asarray(directions, dtype=np.float64).reshape(-1, 3)
+    colors = np.empty((len(origins), 3))
+    colors[:] = BACKGROUND_COLOR
+
+    start = time.time()
+    distance, index, _, _ = scene.accelerator.intersect(origins, directions,
+                                                        counters=counters)
+    if counters is not None:
+        counters.primary += len(origins)
+        counters.add_time('intersect', time.time() - start)
+        start = time.time()
+    if hits is not None:
+        hits[:] = index
+    ray_ids = None
+    if record is not None:
+        ray_ids = np.arange(len(origins))
+        record.add_rays(ray_ids, origins, directions, distance)
+    hit = index != NO_HIT
+    positions = origins[hit] + directions[hit] * distance[hit, None]
+    if ray_ids is not None:
+        ray_ids = ray_ids[hit]
+    colors[hit] = shade_hits(scene, positions, index[hit], directions[hit],
+                             shadows=shadows, reflections=reflections,
+                             counters=counters, record=record,
+                             ray_ids=ray_ids)
+    if counters is not None:
+        counters.add_time('shade', time.time() - start)
+    return colors
+
+
+def shade_hits(scene, positions, tri_indices, directions, shadows=True,
+               reflections=True, counters=None, record=None, ray_ids=None,
+               depth=0):
+    """vectorized version of RayTracer.render_tri
+
+    ray_ids are the primary ray of every hit for the record, depth the amount
+    of bounces that led to the hits
+    """
+    triangles = scene.triangles
+    geometry_ids = triangles.geometry_ids[tri_indices]
+    normals = triangles.normals[tri_indices]
+
+    ambient_diffuse = np.zeros((len(positions), 3))
+    for light_index, (light_position, light_color) in enumerate(
+            zip(scene.light_positions, scene.light_colors)):
+        ambient = light_color * AMBIENT_STRENGTH
+        light_ray = light_position - positions
+        lightdir = normalize(light_ray)
+        diff = np.maximum(np.einsum('ij,ij->i', normals, lightdir), 0.0)
+
+        if shadows:
+            if record is None:
+                in_shadow = scene.accelerator.occluded(
+                    positions, light_ray, ignore_geometry=geometry_ids,
+                    counters=counters)
+            else:
+                _, occluder = scene.accelerator.any_hit(
+                    positions, light_ray, ignore_geometry=geometry_ids,
+                    counters=counters)
+                in_shadow = occluder != NO_HIT
+                occluder_geometry = np.where(
+                    in_shadow, triangles.geometry_ids[occluder], NO_HIT)
+                record.add_shadow_rays(ray_ids, light_index, depth,
+                                       positions, light_ray,
+                                       occluder_geometry)
+            diff[in_shadow] /= 2
+            if counters is not None:
+                counters.shadow += len(positions)
+
+        ambient_diffuse += ambient + diff[:, None] * light_color
+
+    object_color = scene.geometry_colors[geometry_ids]
+    if reflections:
+        refl_directions = reflect(normalize(directions),
+                                  triangles.world_normals[tri_indices])
+        distance, refl_index, _, _ = scene.accelerator.intersect(
+            positions, refl_directions, ignore_geometry=geometry_ids,
+            counters=counters)
+        if counters is not None:
+            counters.reflection += len(positions)
+        if record is not None:
+            record.add_rays(ray_ids, positions, refl_directions, distance)
+        refl_hit = refl_index != NO_HIT
+        if refl_hit.any():
+            refl_positions = positions[refl_hit] + refl_directions[
+                refl_hit] * distance[refl_hit, None]
+            refl_ray_ids = None
+            if ray_ids is not None:
+                refl_ray_ids = ray_ids[refl_hit]
+            refl_color = shade_hits(scene, refl_positions,
+                                    refl_index[refl_hit],
+                                    refl_directions[refl_hit],
+                                    shadows=shadows, reflections=False,
+                                    counters=counters, record=record,
+                                    ray_ids=refl_ray_ids, depth=depth + 1)
+            object_color[refl_hit] = np.minimum(
+                object_color[refl_hit] + refl_color, 1.0)
+
+    ambient_diffuse /= len(scene.light_positions)
+    return ambient_diffuse * object_color
@@ -0,0 +1,351 @@
+"""bounding volume hierarchy over the triangles of a TriangleBatch
+
+Built top down with a binned surface area heuristic, stored as flat node
+arrays and traversed with an explicit stack of ray packets, every stack entry
+holds a node and the indices of the rays that still need to visit it.
+"""
+import numpy as np
+
+from batchtracer import NO_HIT
+
+TOTAL_BINS = 16
+MAX_LEAF_SIZE = 8
+# leaves larger than this are always split, even when the SAH disagrees
+MAX_FORCED_LEAF_SIZE = 64
+# a packet node visit costs a few numpy calls, testing a few more triangles in
+# the same leaf is nearly free, so traversal is weighted above intersection
+TRAVERSAL_COST = 4.0
+INTERSECTION_COST = 1.0
+BOUNDS_PADDING = 0.0000001
+
+
+def _surface_area(extent):
+    return 2.0 * (extent[..., 0] * extent[..., 1] +
+                  extent[..., 1] * extent[..., 2] +
+                  extent[..., 2] * extent[..., 0])
+
+
+def _pad(bounds_min, bounds_max):
+    """grow bounds a little so flat boxes of axis aligned faces still get hit
+    """
+    pad_min = BOUNDS_PADDING * np.maximum(1.0, np.abs(bounds_min))
+    pad_max = BOUNDS_PADDING * np.maximum(1.0, np.abs(bounds_max))
+    return bounds_min - pad_min, bounds_max + pad_max
+
+
+class BVH(object):
+    """SAH bounding volume hierarchy with closest and any hit queries
+
+    has the same intersect/any_hit/occluded interface as TriangleBatch
+    """
+
+    def __init__(self, triangles, max_leaf_size=MAX_LEAF_SIZE,
+                 total_bins=TOTAL_BINS):
+        self.max_leaf_size = max_leaf_size
+        self.total_bins = total_bins
+        self.node_min = np.zeros((0, 3))
+        self.node_max = np.zeros((0, 3))
+        self.node_left = np.zeros(0, dtype=np.int64)
+        self.node_right = np.zeros(0, dtype=np.int64)
+        self.node_start = np.zeros(0, dtype=np.int64)
+        self.node_count = np.zeros(0, dtype=np.int64)
+        self.node_axis = np.zeros(0, dtype=np.int64)
+        self.tri_indices = np.zeros(0, dtype=np.int64)
+        self.triangles = None
+        self.__leaves = np.zeros(0, dtype=np.int64)
+        self.__levels = []
+        self.build(triangles)
+
+    @property
+    def total_nodes(self):
+        return len(self.node_count)
+
+    def build(self, triangles):
+        """full SAH build of the hierarchy
+        """
+        total = len(triangles)
+        tri_min, tri_max = triangles.bounds()
+        centroids = (tri_min + tri_max) * 0.5
+        order = np.arange(total)
+
+        node_min, node_max = [], []
+        node_left, node_right = [], []
+        node_start, node_count, node_axis = [], [], []
+        depths = []
+
+        def new_node(depth):
+            node_min.append(None)
+            node_max.append(None)
+            node_left.append(-1)
+            node_right.append(-1)
+            node_start.append(0)
+            node_count.append(0)
+            node_axis.append(0)
+            depths.append(depth)
+            return len(depths) - 1
+
+        stack = [(new_node(0), 0, total)]
+        while stack:
+            node, start, end = stack.pop()
+            indices = order[start:end]
+            if len(indices):
+                node_min[node] = tri_min[indices].min(axis=0)
+                node_max[node] = tri_max[indices].max(axis=0)
+            else:
+                node_min[node] = np.full(3, np.inf)
+                node_max[node] = np.full(3, -np.inf)
+
+            split = None
+            if len(indices) > self.max_leaf_size:
+                split = self._find_split(centroids[indices],
+                                         tri_min[indices], tri_max[indices],
+                                         node_min[node], node_max[node])
+
+            if split is None:
+                node_start[node] = start
+                node_count[node] = end - start
+                continue
+
+            axis, left_mask = split
+            order[start:end] = np.concatenate((indices[left_mask],
+                                               indices[~left_mask]))
+            middle = start + int(left_mask.sum())
+            left = new_node(depths[node] + 1)
+            right = new_node(depths[node] + 1)
+            node_left[node] = left
+            node_right[node] = right
+            node_axis[node] = axis
+            stack.append((right, middle, end))
+            stack.append((left, start, middle))
+
+        self.node_min, self.node_max = _pad(np.array(node_min),
+                                            np.array(node_max))
+        self.node_left = np.array(node_left, dtype=np.int64)
+        self.node_right = np.array(node_right, dtype=np.int64)
+        self.node_start = np.array(node_start, dtype=np.int64)
+        self.node_count = np.array(node_count, dtype=np.int64)
+        self.node_axis = np.array(node_axis, dtype=np.int64)
+        self.tri_indices = order
+        self.triangles = triangles.take(order)
+
+        is_leaf = self.node_left == -1
+        leaves = np.nonzero(is_leaf)[0]
+        self.__leaves = leaves[np.argsort(self.node_start[leaves],
+                                          kind='stable')]
+        depths = np.array(depths)
+        self.__levels = [np.nonzero(~is_leaf & (depths == depth))[0]
+                         for depth in range(depths.max() + 1)]
+
+    def _find_split(self, centroids, tri_min, tri_max, bounds_min,
+                    bounds_max):
+        """binned SAH split, returns (axis, left mask) or None for a leaf
+        """
+        total = len(centroids)
+        total_bins = self.total_bins
+        parent_area = _surface_area(bounds_max - bounds_min)
+        if parent_area <= 0.0:
+            parent_area = 1.0
+        centroid_min = centroids.min(axis=0)
+        centroid_extent = centroids.max(axis=0) - centroid_min
+
+        # bin all three axes in one pass, flat bin ids are axis * bins + bin
+        scale = np.where(centroid_extent > 0.0, centroid_extent, 1.0)
+        bins = ((centroids - centroid_min) / scale *
+                total_bins).astype(np.int64)
+        np.clip(bins, 0, total_bins - 1, out=bins)
+        flat_bins = (bins + np.arange(3) * total_bins).ravel()
+        counts = np.bincount(flat_bins, minlength=3 * total_bins).reshape(
+            3, total_bins)
+        bin_min = np.full((3 * total_bins, 3), np.inf)
+        bin_max = np.full((3 * total_bins, 3), -np.inf)
+        np.minimum.at(bin_min, flat_bins, np.repeat(tri_min, 3, axis=0))
+        np.maximum.at(bin_max, flat_bins, np.repeat(tri_max, 3, axis=0))
+        bin_min = bin_min.reshape(3, total_bins, 3)
+        bin_max = bin_max.reshape(3, total_bins, 3)
+
+        left_min = np.minimum.accumulate(bin_min, axis=1)[:, :-1]
+        left_max = np.maximum.accumulate(bin_max, axis=1)[:, :-1]
+        right_min = np.minimum.accumulate(bin_min[:, ::-1], axis=1)[:, -2::-1]
+        right_max = np.maximum.accumulate(bin_max[:, ::-1], axis=1)[:, -2::-1]
+        left_count = np.cumsum(counts, axis=1)[:, :-1]
+        right_count = total - left_count
+
+        splittable = (left_count > 0) & (right_count > 0)
+        splittable[centroid_extent <= 0.0] = False
+        best = None
+        if splittable.any():
+            with np.errstate(invalid='ignore'):
+                cost = TRAVERSAL_COST + INTERSECTION_COST * (
+                    _surface_area(left_max - left_min) * left_count +
+                    _surface_area(right_max - right_min) * right_count
+                ) / parent_area
+            cost[~splittable] = np.inf
+            axis, split_bin = np.unravel_index(np.argmin(cost), cost.shape)
+            best_cost = cost[axis, split_bin]
+            best = (int(axis), bins[:, axis] <= split_bin)
+
+        if best is None:
+            if total <= MAX_FORCED_LEAF_SIZE:
+                return None
+            # all centroids coincide, split the list in half
+            left_mask = np.zeros(total, dtype=bool)
+            left_mask[:total // 2] = True
+            return int(np.argmax(bounds_max - bounds_min)), left_mask
+
+        if (best_cost >= total * INTERSECTION_COST and
+                total <= MAX_FORCED_LEAF_SIZE):
+            return None
+        return best
+
+    def refit(self, triangles):
+        """update the node bounds for moved triangles without rebuilding
+
+        the topology is kept, only valid as long as the triangle count and
+        order stays the same, otherwise the hierarchy is rebuilt
+        """
+        if len(triangles) != len(self.tri_indices):
+            self.build(triangles)
+            return
+
+        self.triangles = triangles.take(self.tri_indices)
+        if not len(triangles):
+            return
+        tri_min, tri_max = self.triangles.bounds()
+        node_min = self.node_min
+        node_max = self.node_max
+        starts = self.node_start[self.__leaves]
+        node_min[self.__leaves] = np.minimum.reduceat(tri_min, starts)
+        node_max[self.__leaves] = np.maximum.reduceat(tri_max, starts)
+        node_min[self.__leaves], node_max[self.__leaves] = _pad(
+            node_min[self.__leaves], node_max[self.__leaves])
+
+        for level in reversed(self.__levels):
+            left = self.node_left[level]
+            right = self.node_right[level]
+            node_min[level] = np.minimum(node_min[left], node_min[right])
+            node_max[level] = np.maximum(node_max[left], node_max[right])
+
+    def _intersect_node(self, node, origins, inverse_directions):
+        """slab test of rays against one node, returns entry distance and hits
+        """
+        t1 = (self.node_min[node] - origins) * inverse_directions
+        t2 = (self.node_max[node] - origins) * inverse_directions
+        # fmin/fmax ignore the nan of 0 * inf for rays parallel to a slab
+        t_near = np.fmax.reduce(np.fmin(t1, t2), axis=1)
+        t_far = np.fmin.reduce(np.fmax(t1, t2), axis=1)
+        return t_near, (t_near <= t_far) & (t_far >= 0.0)
+
+    def intersect(self, origins, directions, ignore_geometry=None,
+                  counters=None):
+        """closest hit of every ray
+
+        returns distance, triangle index and barycentric u, v per ray,
+        triangle index is NO_HIT for rays that miss
+        """
+        total_rays = len(origins)
+        distance = np.full(total_rays, np.inf)
+        index = np.full(total_rays, NO_HIT, dtype=np.int64)
+        u = np.zeros(total_rays)
+        v = np.zeros(total_rays)
+        if not len(self.tri_indices) or not total_rays:
+            return distance, index, u, v
+
+        with np.errstate(divide='ignore'):
+            inverse_directions = 1.0 / directions
+
+        stack = [(0, np.arange(total_rays))]
+        while stack:
+            node, rays = stack.pop()
+            with np.errstate(invalid='ignore'):
+                t_near, hit = self._intersect_node(node, origins[rays],
+                                                   inverse_directions[rays])
+            entering = rays[hit & (t_near <= distance[rays])]
+            if counters is not None:
+                counters.bbox_rejections += len(rays) - len(entering)
+            rays = entering
+            if not len(rays):
+                continue
+
+            count = self.node_count[node]
+            if count:
+                start = self.node_start[node]
+                ignore = None if ignore_geometry is None else \
+                    ignore_geometry[rays]
+                t, hit_u, hit_v, valid = self.triangles._moller_trumbore(
+                    origins[rays], directions[rays], ignore,
+                    start=start, end=start + count, counters=counters)
+                t = np.where(valid, t, np.inf)
+                nearest = np.argmin(t, axis=1)
+                rows = np.arange(len(rays))
+                nearest_t = t[rows, nearest]
+                closer = nearest_t < distance[rays]
+                closer_rays = rays[closer]
+                distance[closer_rays] = nearest_t[closer]
+                index[closer_rays] = self.tri_indices[start + nearest[closer]]
+                u[closer_rays] = hit_u[rows, nearest][closer]
+                v[closer_rays] = hit_v[rows, nearest][closer]
+                continue
+
+            near = self.node_left[node]
+            far = self.node_right[node]
+            if directions[rays, self.node_axis[node]].sum() < 0.0:
+                near, far = far, near
+            stack.append((far, rays))
+            stack.append((near, rays))
+        return distance, index, u, v
+
+    def any_hit(self, origins, directions, ignore_geometry=None,
+                counters=None):
+        """distance and triangle index of the first hit found per ray
+        """
+        total_rays = len(origins)
+        distance = np.full(total_rays, np.inf)
+        index = np.full(total_rays, NO_HIT, dtype=np.int64)
+        if not len(self.tri_indices) or not total_rays:
+            return distance, index
+
+        with np.errstate(divide='ignore'):
+            inverse_directions = 1.0 / directions
+
+        stack = [(0, np.arange(total_rays))]
+        while stack:
+            node, rays = stack.pop()
+            rays = rays[index[rays] == NO_HIT]
+            if not len(rays):
+                continue
+            with np.errstate(invalid='ignore'):
+                _, hit = self._intersect_node(node, origins[rays],
+                                              inverse_directions[rays])
+            if counters is not None:
+                counters.bbox_rejections += len(rays) - np.count_nonzero(hit)
+            rays = rays[hit]
+            if not len(rays):
+                continue
+
+            count = self.node_count[node]
+            if count:
+                start = self.node_start[node]
+                ignore = None if ignore_geometry is None else \
+                    ignore_geometry[rays]
+                t, _, _, valid = self.triangles._moller_trumbore(
+                    origins[rays], directions[rays], ignore,
+                    start=start, end=start + count, counters=counters)
+                first = np.argmax(valid, axis=1)
+                rows = np.arange(len(rays))
+                found = valid[rows, first]
+                found_rays = rays[found]
+                distance[found_rays] = t[rows, first][found]
+                index[found_rays] = self.tri_indices[start + first[found]]
+                continue
+
+            stack.append((self.node_right[node], rays))
+            stack.append((self.node_left[node], rays))
+        return distance, index
+
+    def occluded(self, origins, directions, ignore_geometry=None,
+                 counters=None):
+        """True for every ray that hits any triangle
+        """
+        return self.any_hit(origins, directions,
+                            ignore_geometry=ignore_geometry,
+                            counters=counters)[1] != NO_HIT
@@ -0,0 +1,228 @@
+"""triangle meshes loaded from OBJ and PLY files
+
+A Mesh holds its vertices and faces once in numpy arrays, any amount of
+raytracer.MeshInstance objects place it in the scene with their own matrix.
+"""
+import os
+
+import numpy as np
+
+PLY_TYPES = {
+    'char': 'i1', 'int8': 'i1',
+    'uchar': 'u1', 'uint8': 'u1',
+    'short': 'i2', 'int16': 'i2',
+    'ushort': 'u2', 'uint16': 'u2',
+    'int': 'i4', 'int32': 'i4',
+    'uint': 'u4', 'uint32': 'u4',
+    'float': 'f4', 'float32': 'f4',
+    'double': 'f8', 'float64': 'f8',
+}
+
+PLY_BYTE_ORDER = {
+    'binary_little_endian': '<',
+    'binary_big_endian': '>',
+}
+
+
+class Mesh(object):
+    """shared (v, 3) vertices and (f, 3) triangle vertex indices
+
+    the object space face normals and bounds are computed once here and
+    reused by every instance
+    """
+
+    def __init__(self, vertices, faces, name=""):
+        self.name = name
+        self.vertices = np.ascontiguousarray(vertices,
+                                             dtype=np.float64).reshape(-1, 3)
+        self.faces = np.ascontiguousarray(faces, dtype=np.int64).reshape(-1, 3)
+        v0 = self.vertices[self.faces[:, 0]]
+        edge1 = self.vertices[self.faces[:, 1]] - v0
+        edge2 = self.vertices[self.faces[:, 2]] - v0
+        normals = np.cross(edge1, edge2)
+        lengths = np.sqrt(np.einsum('ij,ij->i', normals, normals))
+        lengths[lengths == 0.0] = 1.0
+        self.normals = normals / lengths[:, None]
+        if len(self.vertices):
+            self.bounds_min = self.vertices.min(axis=0)
+            self.bounds_max = self.vertices.max(axis=0)
+        else:
+            self.bounds_min = np.zeros(3)
+            self.bounds_max = np.zeros(3)
+
+    def __len__(self):
+        return len(self.faces)
+
+    def corners(self):
+        """(8, 3) corners of the object space bounding box
+        """
+        corners = np.array([[x, y, z] for x in (0, 1) for y in (0, 1)
+                            for z in (0, 1)], dtype=bool)
+        return np.where(corners, self.bounds_max, self.bounds_min)
+
+
+def triangulate(polygons):
+    """fan triangulate a list of vertex index lists
+    """
+    faces = []
+    for polygon in polygons:
+        for i in range(1, len(polygon) - 1):
+            faces.append((polygon[0], polygon[i], polygon[i + 1]))
+    return faces
+
+
+def load_obj(path):
+    """Mesh of the v and f records of a Wavefront OBJ file
+
+    polygons are fan triangulated, texture and normal indices are ignored
+    """
+    vertices = []
+    polygons = []
+    with open(path) as f:
+        for line in f:
+            parts = line.split()
+            if not parts:
+                continue
+            if parts[0] == 'v':
+                vertices.append([float(value) for value in parts[1:4]])
+            elif parts[0] == 'f':
+                polygon = []
+                for part in parts[1:]:
+                    index = int(part.split('/')[0])
+                    # negative indices count back from the last vertex
+                    if index < 0:
+                        index += len(vertices)
+                    else:
+                        index -= 1
+                    polygon.append(index)
+                polygons.append(polygon)
+    name = os.path.splitext(os.path.basename(path))[0]
+    return Mesh(vertices, triangulate(polygons), name=name)
+
+
+def read_ply_header(f):
+    """format and [(element name, count, [(property, type, list type)])]
+    of a PLY header, f is left at the start of the data
+    """
+    if f.readline().strip() != b'ply':
+        raise ValueError("not a ply file")
+    file_format = None
+    elements = []
+    for line in iter(f.readline, b''):
+        parts = line.decode('ascii').split()
+        if not parts or parts[0] in ('comment', 'obj_info'):
+            continue
+        if parts[0] == 'format':
+            file_format = parts[1]
+        elif parts[0] == 'element':
+            elements.append((parts[1], int(parts[2]), []))
+        elif parts[0] == 'property':
+            if parts[1] == 'list':
+                elements[-1][2].append((parts[4], PLY_TYPES[parts[3]],
+                                        PLY_TYPES[parts[2]]))
+            else:
+                elements[-1][2].append((parts[2], PLY_TYPES[parts[1]], None))
+        elif parts[0] == 'end_header':
+            return file_format, elements
+    raise ValueError("ply header has no end_header")
+
+
+def read_ply_ascii(f, elements):
+    data = {}
+    lines = iter(f.read().decode('ascii').splitlines())
+    for name, count, properties in elements:
+        rows = []
+        for _ in range(count):
+            values = next(lines).split()
+            row = {}
+            for prop_name, _, list_type in properties:
+                if list_type is None:
+                    row[prop_name] = float(values.pop(0))
+                else:
+                    length = int(values.pop(0))
+                    row[prop_name] = [int(value) for value in values[:length]]
+                    values = values[length:]
+            rows.append(row)
+        data[name] = rows
+    return data
+
+
+def read_ply_binary(f, elements, byte_order):
+    """vertex xyz and face index lists of a binary PLY
+
+    triangle only faces are read in one go, other polygons face by face
+    """
+    raw = f.read()
+    offset = 0
+    vertices = None
+    polygons = None
+    for name, count, properties in elements:
+        if all(list_type is None for _, _, list_type in properties):
+            dtype = np.dtype([(prop_name, byte_order + prop_type)
+                              for prop_name, prop_type, _ in properties])
+            records = np.frombuffer(raw, dtype=dtype, count=count,
+                                    offset=offset)
+            offset += dtype.itemsize * count
+            if name == 'vertex':
+                vertices = np.column_stack((records['x'], records['y'],
+                                            records['z']))
+            continue
+
+        if name != 'face' or len(properties) != 1:
+            raise ValueError("unsupported ply element {}".format(name))
+        _, index_type, length_type = properties[0]
+        triangle_dtype = np.dtype([('length', byte_order + length_type),
+                                   ('indices', byte_order + index_type, 3)])
+        if offset + triangle_dtype.itemsize * count <= len(raw):
+            records = np.frombuffer(raw, dtype=triangle_dtype, count=count,
+                                    offset=offset)
+            if np.all(records['length'] == 3):
+                polygons = records['indices']
+                offset += triangle_dtype.itemsize * count
+                continue
+
+        length_dtype = np.dtype(byte_order + length_type)
+        index_dtype = np.dtype(byte_order + index_type)
+        polygons = []
+        for _ in range(count):
+            length = int(np.frombuffer(raw, dtype=length_dtype, count=1,
+                                       offset=offset)[0])
+            offset += length_dtype.itemsize
+            polygons.append(np.frombuffer(raw, dtype=index_dtype,
+                                          count=length,
+                                          offset=offset).tolist())
+            offset += index_dtype.itemsize * length
+        polygons = triangulate(polygons)
+    return vertices, polygons
+
+
+def load_ply(path):
+    """Mesh of the vertex and face elements of an ascii or binary PLY file
+    """
+    with open(path, 'rb') as f:
+        file_format, elements = read_ply_header(f)
+        if file_format == 'ascii':
+            data = read_ply_ascii(f, elements)
+            vertices = [[row['x'], row['y'], row['z']]
+                        for row in data.get('vertex', [])]
+            polygons = [row.get('vertex_indices', row.get('vertex_index'))
+                        for row in data.get('face', [])]
+            faces = triangulate(polygons)
+        elif file_format in PLY_BYTE_ORDER:
+            vertices, faces = read_ply_binary(f, elements,
+                                              PLY_BYTE_ORDER[file_format])
+        else:
+            raise ValueError("unsupported ply format {}".format(file_format))
+    name = os.path.splitext(os.path.basename(path))[0]
+    return Mesh(vertices, faces, name=name)
+
+
+def load_mesh(path):
+    """Mesh of an .obj or .ply file
+    """
+    extension = os.path.splitext(path)[1].lower()
+    if extension == '.obj':
+        return load_obj(path)
+    if extension == '.ply':
+        return load_ply(path)
+    raise ValueError("unsupported mesh file {}".format(path))
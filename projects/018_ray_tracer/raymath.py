@@ -0,0 +1,156 @@
+"""Qt free vector and matrix math for the ray tracer
+
+Vectors are plain numpy arrays of shape (3,) or (n, 3). Matrix4x4 mirrors the
+parts of QMatrix4x4 the scene graph uses, every transform post multiplies
+the current matrix like Qt does.
+"""
+import math
+
+import numpy as np
+
+
+def vector3(x=0.0, y=0.0, z=0.0):
+    return np.array([x, y, z], dtype=np.float64)
+
+
+def normalized(v):
+    """normalized copy of a (3,) vector, a zero vector stays zero
+    """
+    length = math.sqrt(v[0] * v[0] + v[1] * v[1] + v[2] * v[2])
+    if length == 0.0:
+        return np.zeros(3)
+    return v / length
+
+
+def length(v):
+    return math.sqrt(v[0] * v[0] + v[1] * v[1] + v[2] * v[2])
+
+
+def dot(a, b):
+    return a[0] * b[0] + a[1] * b[1] + a[2] * b[2]
+
+
+def cross(a, b):
+    return np.array([a[1] * b[2] - a[2] * b[1],
+                     a[2] * b[0] - a[0] * b[2],
+                     a[0] * b[1] - a[1] * b[0]])
+
+
+class Matrix4x4(object):
+    """4x4 transformation matrix backed by a numpy array
+    """
+    __slots__ = ('m',)
+
+    def __init__(self, other=None):
+        if other is None:
+            self.m = np.identity(4)
+        elif isinstance(other, Matrix4x4):
+            self.m = other.m.copy()
+        else:
+            self.m = np.array(other, dtype=np.float64).reshape(4, 4)
+
+    def copy(self):
+        return Matrix4x4(self)
+
+    def __eq__(self, other):
+        return isinstance(other, Matrix4x4) and np.array_equal(self.m,
+                                                               other.m)
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __repr__(self):
+        return 'Matrix4x4({!r})'.format(self.m.tolist())
+
+    def __mul__(self, other):
+        """matrix product, or map (3,)/(n, 3) points, or (4,) vectors
+        """
+        if isinstance(other, Matrix4x4):
+            return Matrix4x4(np.dot(self.m, other.m))
+        other = np.asarray(other, dtype=np.float64)
+        if other.shape == (4,):
+            return np.dot(self.m, other)
+        return self.map_points(other)
+
+    def map_points(self, points):
+        """transform (3,) or (n, 3) points including the perspective divide
+        """
+        points = np.asarray(points, dtype=np.float64)
+        mapped = np.dot(points, self.m[:3, :3].T) + self.m[:3, 3]
+        w = np.dot(points, self.m[3, :3]) + self.m[3, 3]
+        w = np.where(w == 0.0, 1.0, w)
+        if points.ndim == 1:
+            return mapped / w
+        return mapped / w[:, None]
+
+    def map_vectors(self, vectors):
+        """transform (3,) or (n, 3) directions, ignoring translation
+        """
+        return np.dot(np.asarray(vectors, dtype=np.float64), self.m[:3, :3].T)
+
+    def column(self, index):
+        return self.m[:, index].copy()
+
+    def inverted(self):
+        """(inverse, invertible) like QMatrix4x4.inverted
+        """
+        try:
+            return Matrix4x4(np.linalg.inv(self.m)), True
+        except np.linalg.LinAlgError:
+            return Matrix4x4(), False
+
+    def translate(self, x, y=None, z=None):
+        if y is None:
+            x, y, z = x
+        translation = np.identity(4)
+        translation[:3, 3] = (x, y, z)
+        self.m = np.dot(self.m, translation)
+
+    def scale(self, x, y=None, z=None):
+        if y is None:
+            y = z = x
+        self.m = np.dot(self.m, np.diag([x, y, z, 1.0]))
+
+    def rotate(self, angle, x, y=None, z=None):
+        """rotate angle degrees around an axis given as vector or x, y, z
+        """
+        if y is None:
+            x, y, z = x
+        axis_length = math.sqrt(x * x + y * y + z * z)
+        if axis_length == 0.0:
+            return
+        x, y, z = x / axis_length, y / axis_length, z / axis_length
+        radians = math.radians(angle)
+        c = math.cos(radians)
+        s = math.sin(radians)
+        ic = 1.0 - c
+        rotation = np.identity(4)
+        rotation[:3, :3] = [
+            [x * x * ic + c, x * y * ic - z * s, x * z * ic + y * s],
+            [y * x * ic + z * s, y * y * ic + c, y * z * ic - x * s],
+            [x * z * ic - y * s, y * z * ic + x * s, z * z * ic + c]]
+        self.m = np.dot(self.m, rotation)
+
+    def look_at(self, eye, center, up):
+        eye = np.asarray(eye, dtype=np.float64)
+        forward = normalized(np.asarray(center, dtype=np.float64) - eye)
+        side = normalized(cross(forward, np.asarray(up, dtype=np.float64)))
+        up = cross(side, forward)
+        view = np.identity(4)
+        view[0, :3] = side
+        view[1, :3] = up
+        view[2, :3] = -forward
+        view[:3, 3] = (-dot(side, eye), -dot(up, eye), dot(forward, eye))
+        self.m = np.dot(self.m, view)
+
+    def perspective(self, vertical_angle, aspect_ratio, near_plane,
+                    far_plane):
+        cotangent = 1.0 / math.tan(math.radians(vertical_angle) / 2.0)
+        clip = far_plane - near_plane
+        projection = np.zeros((4, 4))
+        projection[0, 0] = cotangent / aspect_ratio
+        projection[1, 1] = cotangent
+        projection[2, 2] = -(near_plane + far_plane) / clip
+        projection[2, 3] = -(2.0 * near_plane * far_plane) / clip
+        projection[3, 2] = -1.0
+        self.m = np.dot(self.m, projection)
@@ -0,0 +1,912 @@
+"""ray tracer scene graph and renderer
+
+Qt free, vectors are numpy arrays and matrices raymath.Matrix4x4 so scenes
+can be rendered headless and pickled to worker processes.
+"""
+import sys
+
+import numpy as np
+
+from batchtracer import TriangleBatch, SceneBatch, trace_rays, NO_HIT
+from antialias import AdaptiveSampler
+from bvh import BVH
+from shadowcache import OcclusionCache
+from raymath import Matrix4x4, vector3, normalized, length, dot, cross
+from renderstats import RenderStats
+from tilerenderer import TileRenderer
+
+DIMENSIONS = [0, 1, 2]
+
+RIGHT = 0
+LEFT = 1
+MIDDLE = 2
+EPSILON = 0.0000001
+
+
+class BoundingBox(object):
+    def __init__(self, min_, max_):
+        self.min = min_
+        self.max = max_
+
+
+class DataPoint(object):
+    def __init__(self, pos=None, geometry=None, tri=None, world_tri=None):
+        self.pos = pos
+        self.geometry = geometry
+        self.tri = tri
+        self.world_tri = world_tri
+
+
+class Triangle(object):
+    def __init__(self, geometry, vertex0, vertex1, vertex2, normal=None):
+        self.vertex0 = vertex0
+        self.vertex1 = vertex1
+        self.vertex2 = vertex2
+        self.geometry = geometry
+        self.world_v0 = None
+        self.world_v1 = None
+        self.world_v2 = None
+        if normal is None:
+            normal = vector3()
+        self.normal = normal
+
+    def calculate_world(self):
+        self.world_v0 = self.geometry.matrix * self.vertex0
+        self.world_v1 = self.geometry.matrix * self.vertex1
+        self.world_v2 = self.geometry.matrix * self.vertex2
+
+    def __mul__(self, other):
+        v0 = other * self.vertex0
+        v1 = other * self.vertex1
+        v2 = other * self.vertex2
+        return Triangle(self.geometry, v0, v1, v2, self.normal)
+
+
+class PointLight(object):
+    def __init__(self):
+        self.__matrix = Matrix4x4()
+        self.color = np.array([1.0, 1.0, 1.0])
+        self.name = "pointLight"
+        self.position = None
+
+    @property
+    def matrix(self):
+        return self.__matrix
+
+    @matrix.setter
+    def matrix(self, value):
+        self.__matrix = value
+        self.position = value.column(3)[:3]
+
+    def get_position(self):
+        return self.position
+
+    def translate(self, x, y, z):
+        self.__matrix.translate(x, y, z)
+        self.position = self.__matrix.column(3)[:3]
+
+
+class Ray(object):
+    def __init__(self, pos, direction):
+        self.pos = pos
+        self.direction = direction
+
+
+class Camera(object):
+    def __init__(self):
+        self.matrix = Matrix4x4()
+
+        projection = Matrix4x4()
+        projection.perspective(45.0, 1.0, 1, 1000)
+        self.projection = projection.inverted()[0]
+
+    def position(self):
+        return self.matrix.column(3)[:3]
+
+
+class Geometry(object):
+    def __init__(self):
+        self.name = ""
+        self.matrix = Matrix4x4()
+        self.verts = []
+        self.tris = []
+        self.__boundingbox = None
+        self.__boundingbox_worldspace = None
+        self.object_color = vector3(1, 1, 1)
+
+    @property
+    def boundingbox(self):
+        return self.__boundingbox
+
+    @boundingbox.setter
+    def boundingbox(self, value):
+        self.__boundingbox = value
+        self.calculate()
+
+    def calculate(self):
+        if self.verts:
+            world_verts = self.matrix.map_points(np.array(self.verts))
+            min_ = world_verts.min(axis=0)
+            max_ = world_verts.max(axis=0)
+        else:
+            min_ = vector3()
+            max_ = vector3()
+        self.__boundingbox_worldspace = BoundingBox(min_, max_)
+
+        self.calculate_world_tris()
+
+    @property
+    def boundingbox_worldspace(self):
+        """return world space bounding box
+        """
+        return self.__boundingbox_worldspace
+
+    @boundingbox_worldspace.setter
+    def boundingbox_worldspace(self, value):
+        self.__boundingbox_worldspace = value
+
+    def position(self):
+        return self.matrix.column(3)[:3]
+
+    def calculate_world_tris(self):
+        for tri in self.tris:
+            tri.calculate_world()
+
+    def triangle(self, index):
+        return self.tris[index]
+
+    def world_triangles(self):
+        """world space v0, v1, v2 and object space normal (n, 3) arrays
+        """
+        v0 = np.array([tri.world_v0 for tri in self.tris]).reshape(-1, 3)
+        v1 = np.array([tri.world_v1 for tri in self.tris]).reshape(-1, 3)
+        v2 = np.array([tri.world_v2 for tri in self.tris]).reshape(-1, 3)
+        normals = np.array([tri.normal for tri in self.tris]).reshape(-1, 3)
+        return v0, v1, v2, normals
+
+
+class Locator(object):
+    def __init__(self):
+        self.matrix = Matrix4x4()
+
+    def position(self):
+        return self.matrix.column(3)[:3]
+
+
+class Cube(Geometry):
+    def __init__(self):
+        # https://www.siggraph.org/education/materials/HyperGraph/modeling/polymesh/polymesh.htm
+        super(Cube, self).__init__()
+        p1 = [-1, -1, 1]
+        p2 = [1, -1, 1]
+        p3 = [1, 1, 1]
+        p4 = [-1, 1, 1]
+        p5 = [-1, 1, -1]
+        p6 = [1, 1, -1]
+        p7 = [-1, -1, -1]
+        p8 = [1, -1, -1]
+
+        cube_struct = [
+            p1, p2, p3,
+            p3, p4, p1,
+            p5, p4, p3,
+            p3, p6, p5,
+            p3, p2, p8,
+            p8, p6, p3,
+            p5, p7, p1,
+            p1, p4, p5,
+            p6, p8, p7,
+            p7, p5, p6
+        ]
+
+        for i in range(0, len(cube_struct), 3):
+            p0 = cube_struct[i]
+            p1 = cube_struct[i + 1]
+            p2 = cube_struct[i + 2]
+
+            p0 = vector3(*p0)
+            p1 = vector3(*p1)
+            p2 = vector3(*p2)
+
+            self.verts += [p0, p1, p2]
+            n = RayTracer.calculate_normal(p0, p1, p2)
+            t = Triangle(self, p0, p1, p2, n)
+            t.calculate_world()
+            self.tris.append(t)
+
+        self.boundingbox = BoundingBox(vector3(-1, -1, -1),
+                                       vector3(1, 1, 1))
+
+
+class MeshInstance(Geometry):
+    """a meshloader.Mesh placed in the scene with its own matrix
+
+    the triangles stay in the arrays of the shared mesh, Triangle objects are
+    only created for the scalar render path when it asks for them
+    """
+
+    def __init__(self, mesh):
+        super(MeshInstance, self).__init__()
+        self.mesh = mesh
+        self.name = mesh.name
+        self.__tris = None
+        self.__world_triangles = None
+        self.__world_matrix = None
+        self.calculate()
+
+    @property
+    def tris(self):
+        if self.__tris is None:
+            self.__tris = [self.create_triangle(i) for i in range(len(
+                self.mesh))]
+        return self.__tris
+
+    @tris.setter
+    def tris(self, value):
+        self.__tris = value
+
+    def create_triangle(self, index):
+        vertices = self.mesh.vertices[self.mesh.faces[index]]
+        tri = Triangle(self, vertices[0], vertices[1], vertices[2],
+                       self.mesh.normals[index])
+        tri.calculate_world()
+        return tri
+
+    def calculate(self):
+        # the bounds of the mesh are only transformed, not recomputed
+        corners = self.matrix.map_points(self.mesh.corners())
+        self.boundingbox_worldspace = BoundingBox(corners.min(axis=0),
+                                                  corners.max(axis=0))
+        self.calculate_world_tris()
+
+    def calculate_world_tris(self):
+        if self.__tris:
+            for tri in self.__tris:
+                tri.calculate_world()
+
+    def triangle(self, index):
+        if self.__tris:
+            return self.__tris[index]
+        return self.create_triangle(index)
+
+    def world_triangles(self):
+        if self.__world_matrix != self.matrix:
+            vertices = self.matrix.map_points(self.mesh.vertices)
+            faces = self.mesh.faces
+            self.__world_triangles = (vertices[faces[:, 0]],
+                                      vertices[faces[:, 1]],
+                                      vertices[faces[:, 2]],
+                                      self.mesh.normals)
+            self.__world_matrix = self.matrix.copy()
+        return self.__world_triangles
+
+
+class RayTracer(object):
+    def __init__(self):
+        self.is_rendering = False
+        self.render_camera = Camera()
+        self.objects = []
+        self.__geometries = []
+        self.__lights = []
+
+        self.__render_resolution = (0, 0)
+        self.only_sample_nearest = True
+        self.__output_data = np.zeros((0, 0, 3))
+        self.fps = 0.00
+        self.vp = Matrix4x4()
+        self.vp_inverted = Matrix4x4()
+        self.enabled_shadows = True
+        self.enabled_reflections = True
+        self.__total_lights = 0
+        self.batched = True
+        self.use_bvh = True
+        self.bvh = None
+        # first packed triangle index of every geometry
+        self.__triangle_offsets = np.zeros(1, dtype=np.int64)
+        self.tiled = False
+        self.workers = None
+        self.tile_renderer = None
+        self.__tile_signature = None
+        # camera rays through the pixel centers, (height, width, 3) arrays
+        # regenerated by update_rays when the camera or resolution changes
+        self.ray_origins = np.zeros((0, 0, 3))
+        self.ray_directions = np.zeros((0, 0, 3))
+        self.__ray_grid_key = None
+        # ray counts and phase timings of the last finished frame
+        self.stats = RenderStats()
+        # only retrace the pixels affected by moving geometry
+        self.use_occlusion_cache = True
+        self.occlusion_cache = OcclusionCache()
+        # extra samples on the edges of the batched frame, the scalar and
+        # tiled renders do not anti-alias
+        self.antialiasing = False
+        self.sampler = AdaptiveSampler()
+
+    @property
+    def counters(self):
+        return self.stats.counters
+
+    def remove_matrix_translation(self, matrix):
+        matrix = Matrix4x4(matrix)
+        v = matrix.column(3)[:3]
+        matrix.translate(v)
+        return matrix
+
+    @property
+    def render_resolution(self):
+        """(width, height) of the output data
+        """
+        return self.__render_resolution
+
+    @render_resolution.setter
+    def render_resolution(self, value):
+        self.__render_resolution = tuple(value)
+
+    @staticmethod
+    def multiply_matrix(v, matrix):
+        return matrix * v
+
+    def get_lights(self):
+        return self.__lights
+
+    def setup_output_data(self):
+        width, height = self.render_resolution
+        self.__output_data = np.zeros((height, width, 3))
+
+    def calculate_matrices(self):
+        self.vp = (self.render_camera.projection * self.render_camera.matrix)
+        self.vp_inverted = self.vp.inverted()[0]
+
+    def world_to_screen(self, v):
+        """map (3,) or (n, 3) world positions to screen space
+        """
+        return self.vp.map_points(v)
+
+    def screen_to_world(self, v):
+        """map (3,) or (n, 3) screen positions to world space
+        """
+        return self.vp_inverted.map_points(v)
+
+    @staticmethod
+    def calculate_normal(v0, v1, v2):
+        edge1 = v1 - v0
+        edge2 = v2 - v0
+        return normalized(cross(edge1, edge2))
+
+    def intersect_boundingbox(self, bbaa, ray):
+        """check if a point intersects a bbaa
+        """
+        origin = ray.pos
+
+        inside = True
+        quadrant = [-1, -1, -1]
+
+        candidatePlane = [0.0, 0.0, 0.0]
+        minB = bbaa.min
+        maxB = bbaa.max
+
+        for i in DIMENSIONS:
+            if origin[i] < minB[i]:
+                quadrant[i] = LEFT
+                candidatePlane[i] = minB[i]
+                inside = False
+            elif origin[i] > maxB[i]:
+                quadrant[i] = RIGHT
+                candidatePlane[i] = maxB[i]
+                inside = False
+            else:
+                quadrant[i] = MIDDLE
+
+        if inside is True:
+            return np.array(origin, dtype=np.float64)
+
+        maxT = [0.0, 0.0, 0.0]
+        dir_ = ray.direction
+
+        for i in DIMENSIONS:
+            if quadrant[i] != MIDDLE and dir_[i] != 0.0:
+                maxT[i] = (candidatePlane[i] - origin[i]) / dir_[i]
+            else:
+                maxT[i] = -1.0
+
+        which_plane = 0
+        for i in DIMENSIONS:
+            if maxT[which_plane] < maxT[i]:
+                which_plane = i
+
+        if maxT[which_plane] < 0.0:
+            return None
+
+        coord = [0.0, 0.0, 0.0]
+        for i in DIMENSIONS:
+            if which_plane != i:
+                coord[i] = origin[i] + maxT[which_plane] * dir_[i]
+                if coord[i] < minB[i] or coord[i] > maxB[i]:
+                    return None
+            else:
+                coord[i] = candidatePlane[i]
+        return np.array(coord)
+
+    def intersect_triangle(self, ray, triangle):
+        # https://en.wikipedia.org/wiki/M%C3%B6ller%E2%80%93Trumbore_intersection_algorithm
+        vertex0 = triangle.world_v0
+        vertex1 = triangle.world_v1
+        vertex2 = triangle.world_v2
+
+        edge1 = vertex1 - vertex0
+        edge2 = vertex2 - vertex0
+        h = cross(ray.direction, edge2)
+        a = dot(edge1, h)
+
+        self.counters.triangle_tests += 1
+        if -EPSILON < a < EPSILON:
+            return None
+        f = 1 / a
+        s = ray.pos - vertex0
+        u = f * (dot(s, h))
+        if u < 0.0 or u > 1.0:
+            return None
+
+        q = cross(s, edge1)
+        v = f * dot(ray.direction, q)
+        if v < 0.0 or u + v > 1.0:
+            return None
+
+        t = f * dot(edge2, q)
+        if t > EPSILON:
+            intersection_point = ray.pos + ray.direction * t
+            return intersection_point
+        else:
+            return None
+
+    def reflect_vector(self, vector, normal):
+        return vector - (normal * 2 * dot(vector, normal))
+
+    def render_tri(self, geometry, tri, pos, color, ray, reflections=True):
+        object_color = geometry.object_color
+
+        ambient_diffuse = vector3()
+
+        for light in self.__lights:
+            ambient_strength = 0.2
+            ambient = light.color * ambient_strength
+
+            lightdir = normalized(light.position - pos)
+
+            # diff = max(dot(tri.normal, lightdir), 0.0)
+            dot_ = dot(tri.normal, lightdir)
+            diff = dot_ if dot_ > 0 else 0.0
+
+            # shadows
+            if self.enabled_shadows:
+                self.counters.shadow += 1
+                light_ray = (light.position - pos)
+                shadow_ray = Ray(pos, light_ray)
+                intersected_data = self.intersected_geometry(shadow_ray,
+                                                             ignore_geo=[
+                                                                 geometry])
+                if intersected_data:
+                    # v = intersected_pos - pos
+                    # v.normalize()
+                    diff /= 2
+
+            diffuse = diff * light.color
+            ambient_diffuse += ambient + diffuse
+
+        if reflections is True and self.enabled_reflections:
+            normal = self.calculate_normal(tri.world_v0,
+                                           tri.world_v1,
+                                           tri.world_v2)
+            refl_direction = self.reflect_vector(normalized(ray.direction),
+                                                 normal)
+
+            reflection_ray = Ray(pos, refl_direction)
+            self.counters.reflection += 1
+
+            refl_data = self.intersected_nearest(reflection_ray,
+                                                 ignore_tri=[tri],
+                                                 ignore_geo=[geometry])
+
+            if refl_data:
+                refl_color = [0.0, 0.0, 0.0]
+                screen_pos = self.world_to_screen(refl_data.pos)
+                relf_ray = self.pixel_ray(*self.screen_to_pixel(screen_pos))
+
+                self.render_tri(refl_data.geometry, refl_data.tri,
+                                refl_data.pos, refl_color, relf_ray,
+                                reflections=False)
+                object_color = object_color + np.array(refl_color)
+                self.clamp_color_vector(object_color)
+
+        ambient_diffuse /= self.__total_lights
+        color_out = ambient_diffuse * object_color
+        color[0] = color_out[0]
+        color[1] = color_out[1]
+        color[2] = color_out[2]
+
+    def clamp_color_vector(self, v):
+        np.minimum(v, 1.0, out=v)
+
+    def _bvh_query(self, ray, ignore_geo=None, ignore_tri=None):
+        """array arguments of a single ray BVH query, None if the BVH can not
+        answer it
+        """
+        if not self.use_bvh or self.bvh is None:
+            return None
+        ignore_geo = ignore_geo or []
+        if len(ignore_geo) > 1:
+            return None
+        if ignore_tri:
+            for tri in ignore_tri:
+                if tri.geometry not in ignore_geo:
+                    return None
+
+        ignore_id = NO_HIT
+        if ignore_geo and ignore_geo[0] in self.__geometries:
+            ignore_id = self.__geometries.index(ignore_geo[0])
+        origins = np.asarray(ray.pos, dtype=np.float64)[None, :]
+        directions = np.asarray(ray.direction, dtype=np.float64)[None, :]
+        return origins, directions, np.array([ignore_id])
+
+    def _bvh_data_point(self, ray, distance, index):
+        if index == NO_HIT:
+            return None
+        geometry_id = np.searchsorted(self.__triangle_offsets, index,
+                                      side='right') - 1
+        geometry = self.__geometries[geometry_id]
+        tri = geometry.triangle(index - self.__triangle_offsets[geometry_id])
+        pos = ray.pos + ray.direction * float(distance)
+        return DataPoint(pos=pos, tri=tri, geometry=tri.geometry)
+
+    def intersected_geometry(self, ray, ignore_geo=None, ignore_tri=None):
+        query = self._bvh_query(ray, ignore_geo=ignore_geo,
+                                ignore_tri=ignore_tri)
+        if query:
+            distance, index = self.bvh.any_hit(*query,
+                                               counters=self.counters)
+            return self._bvh_data_point(ray, distance[0], index[0])
+
+        res = self.intersected_geometries(ray, ignore_geo=ignore_geo,
+                                          ignore_tri=ignore_tri, first=True)
+        if res:
+            return res[0]
+        else:
+            return None
+
+    def intersected_nearest(self, ray, ignore_geo=None, ignore_tri=None):
+        """closest intersection along the ray as DataPoint
+        """
+        query = self._bvh_query(ray, ignore_geo=ignore_geo,
+                                ignore_tri=ignore_tri)
+        if query:
+            distance, index, _, _ = self.bvh.intersect(
+                *query, counters=self.counters)
+            return self._bvh_data_point(ray, distance[0], index[0])
+
+        data = self.intersected_geometries(ray, ignore_geo=ignore_geo,
+                                           ignore_tri=ignore_tri)
+        return self.get_nearest_data_point(ray.pos, data)
+
+    def intersected_geometries(self, ray, ignore_geo=None, ignore_tri=None,
+                               first=False):
+        data_list = []
+        for obj in self.__geometries:
+            if ignore_geo and obj in ignore_geo:
+                continue
+
+            if self.intersect_boundingbox(obj.boundingbox_worldspace,
+                                          ray) is None:
+                self.counters.bbox_rejections += 1
+                continue
+
+            for tri in obj.tris:
+                if ignore_tri and tri in ignore_tri:
+                    continue
+                # put the triangle in world space
+                pos = self.intersect_triangle(ray, tri)
+                if pos is not None:
+                    data = DataPoint(pos=pos, tri=tri, geometry=obj)
+                    data_list.append(data)
+                    if first is True:
+                        return data_list
+        return data_list
+
+    def render_pixel(self, ray, color):
+        self.counters.primary += 1
+        with self.stats.phase('intersect'):
+            data = self.intersected_nearest(ray)
+        if not data:
+            color[0] = 0.3
+            color[1] = 0.3
+            color[2] = 0.3
+            return
+
+        with self.stats.phase('shade'):
+            self.render_tri(data.geometry, data.tri, data.pos, color, ray)
+        return
+
+    def screen_to_rays(self, screen_x, screen_y):
+        """camera rays through arrays of screen positions
+
+        returns (n, 3) origins on the near plane and normalized directions
+        """
+        screen_x = np.asarray(screen_x, dtype=np.float64).ravel()
+        screen_y = np.asarray(screen_y, dtype=np.float64).ravel()
+        total = len(screen_x)
+        far = self.screen_to_world(np.column_stack(
+            (screen_x, screen_y, np.full(total, -1.0))))
+        near = self.screen_to_world(np.column_stack(
+            (screen_x, screen_y, np.full(total, 1.0))))
+        directions = far - near
+        lengths = np.sqrt(np.einsum('ij,ij->i', directions, directions))
+        lengths[lengths == 0.0] = 1.0
+        return near, directions / lengths[:, None]
+
+    def screen_to_pixel(self, screen_pos):
+        """(x, y) of the pixel under a screen position, clamped to the frame
+        """
+        width, height = self.render_resolution
+        x = int((screen_pos[0] + 1.0) / 2.0 * width)
+        y = int((1.0 - screen_pos[1]) / 2.0 * height)
+        return min(max(x, 0), width - 1), min(max(y, 0), height - 1)
+
+    def pixel_ray(self, x, y):
+        """camera ray through the center of a pixel from the ray grid
+        """
+        return Ray(self.ray_origins[y, x], self.ray_directions[y, x])
+
+    def calculate_rays(self):
+        width, height = self.render_resolution
+        step_width = 1.0 / float(width)
+        step_height = 1.0 / float(height)
+        half_step_width = step_width / 2.0
+        half_step_height = step_height / 2.0
+        screen_y = ((((step_height * np.arange(height)) + half_step_height) *
+                     2.0) - 1.0) * -1
+        screen_x = (((step_width * np.arange(width)) + half_step_width) *
+                    2.0) - 1.0
+        grid_x, grid_y = np.meshgrid(screen_x, screen_y)
+        origins, directions = self.screen_to_rays(grid_x, grid_y)
+        self.ray_origins = origins.reshape(height, width, 3)
+        self.ray_directions = directions.reshape(height, width, 3)
+        self.__ray_grid_key = (self.render_resolution, self.vp)
+
+    def update_rays(self):
+        """recalculate the ray grid and output data when the camera or the
+        resolution changed since the last call
+        """
+        self.calculate_matrices()
+        if self.__ray_grid_key == (self.render_resolution, self.vp):
+            return
+        self.calculate_rays()
+        width, height = self.render_resolution
+        if self.__output_data.shape != (height, width, 3):
+            self.setup_output_data()
+
+    def start(self):
+        # index objects
+        self.__geometries = []
+        self.__lights = []
+        for obj in self.objects:
+            if isinstance(obj, Geometry):
+                self.__geometries.append(obj)
+            elif isinstance(obj, PointLight):
+                self.__lights.append(obj)
+
+        self.__total_lights = len(self.__lights)
+        self.occlusion_cache.invalidate()
+
+        # build the acceleration structure over all triangles
+        for obj in self.__geometries:
+            obj.calculate_world_tris()
+        self.bvh = BVH(self.pack_triangles())
+
+    def update_bvh(self):
+        """refit the BVH to moved geometry, returns the packed triangles
+        """
+        triangles = self.pack_triangles()
+        if self.bvh is None:
+            self.bvh = BVH(triangles)
+        else:
+            self.bvh.refit(triangles)
+        return triangles
+
+    def pack_triangles(self):
+        """world space triangles of all geometries as a TriangleBatch
+
+        the triangles of every geometry follow each other in the order of the
+        geometries
+        """
+        if not self.__geometries:
+            self.__triangle_offsets = np.zeros(1, dtype=np.int64)
+            return TriangleBatch([], [], [], [], [])
+        arrays = [obj.world_triangles() for obj in self.__geometries]
+        counts = [len(normals) for _, _, _, normals in arrays]
+        self.__triangle_offsets = np.concatenate(([0], np.cumsum(counts)))
+        v0, v1, v2, normals = [np.concatenate(columns)
+                               for columns in zip(*arrays)]
+        geometry_ids = np.repeat(np.arange(len(arrays)), counts)
+        return TriangleBatch(v0, v1, v2, normals, geometry_ids)
+
+    def pack_scene(self, triangles=None):
+        """snapshot the scene into contiguous arrays for batched rendering
+        """
+        if triangles is None:
+            triangles = self.pack_triangles()
+
+        geometry_colors = [obj.object_color for obj in self.__geometries]
+        light_positions = [light.position for light in self.__lights]
+        light_colors = [light.color for light in self.__lights]
+        accelerator = None
+        if self.use_bvh and self.bvh is not None:
+            accelerator = self.bvh
+        return SceneBatch(triangles, geometry_colors, light_positions,
+                          light_colors, accelerator=accelerator)
+
+    def render_batched(self, triangles=None):
+        """render all primary rays in one array pass
+        """
+        if triangles is None:
+            triangles = self.pack_triangles()
+        scene = self.pack_scene(triangles)
+        if self.use_occlusion_cache:
+            matrices = [obj.matrix for obj in self.__geometries]
+            bounds = triangles.geometry_bounds(len(self.__geometries))
+            colors = self.occlusion_cache.render(
+                scene, self.ray_origins, self.ray_directions, matrices,
+                bounds, shadows=self.enabled_shadows,
+                reflections=self.enabled_reflections, counters=self.counters)
+            tri_indices = self.occlusion_cache.tri_indices
+        else:
+            tri_indices = np.empty(self.ray_origins.shape[:2], dtype=np.int64)
+            colors = trace_rays(scene, self.ray_origins, self.ray_directions,
+                                shadows=self.enabled_shadows,
+                                reflections=self.enabled_reflections,
+                                counters=self.counters,
+                                hits=tri_indices.reshape(-1))
+        with self.stats.phase('output'):
+            self.__output_data[...] = colors.reshape(self.__output_data.shape)
+
+        if self.antialiasing:
+            def trace(origins, directions):
+                return trace_rays(scene, origins, directions,
+                                  shadows=self.enabled_shadows,
+                                  reflections=self.enabled_reflections,
+                                  counters=self.counters)
+
+            self.sampler.refine(self.__output_data,
+                                tri_indices.reshape(self.ray_origins.shape[:2]),
+                                self.screen_to_rays, trace)
+
+    def render(self):
+
+        self.is_rendering = True
+        self.stats.begin_frame()
+        with self.stats.phase('ray generation'):
+            self.update_rays()
+
+        # calculate world tris
+        with self.stats.phase('bvh'):
+            for obj in self.__geometries:
+                obj.calculate_world_tris()
+            triangles = self.update_bvh()
+
+        if self.batched:
+            self.render_batched(triangles)
+        else:
+            for y, col in enumerate(self.__output_data):
+                for x, color in enumerate(col):
+                    self.render_pixel(self.pixel_ray(x, y), color)
+
+        self.stats.end_frame()
+        self.fps = self.stats.fps
+        self.is_rendering = False
+
+    def scene_signature(self):
+        """copies of everything that invalidates a frame when it changes
+        """
+        matrices = [self.render_camera.matrix.copy()]
+        for obj in self.__geometries:
+            matrices.append(obj.matrix.copy())
+        return self.render_resolution, matrices
+
+    def render_tiles(self):
+        """progressive multi process render step for the event loop
+
+        starts a frame when none is in flight, restarts it when the camera,
+        a geometry matrix or the resolution changed and copies finished
+        tiles into the output data. Returns True when a frame completed.
+        """
+        if self.tile_renderer is None:
+            self.tile_renderer = TileRenderer(workers=self.workers)
+        self.update_rays()
+
+        if self.__tile_signature is not None:
+            if self.scene_signature() != self.__tile_signature:
+                self.tile_renderer.cancel()
+                self.__tile_signature = None
+
+        if self.__tile_signature is None:
+            self.is_rendering = True
+            self.stats.begin_frame()
+            with self.stats.phase('bvh'):
+                for obj in self.__geometries:
+                    obj.calculate_world_tris()
+                scene = self.pack_scene(self.update_bvh())
+            self.__tile_signature = self.scene_signature()
+            self.tile_renderer.start_frame(scene, self.ray_origins,
+                                           self.ray_directions,
+                                           shadows=self.enabled_shadows,
+                                           reflections=self.enabled_reflections)
+
+        with self.stats.phase('output'):
+            self.tile_renderer.poll(self.__output_data)
+        if self.tile_renderer.is_busy:
+            return False
+
+        self.counters.add(self.tile_renderer.counters)
+        self.stats.end_frame()
+        self.fps = self.stats.fps
+        self.__tile_signature = None
+        self.is_rendering = False
+        return True
+
+    def stop(self):
+        """release the worker processes
+        """
+        if self.tile_renderer is not None:
+            self.tile_renderer.shutdown()
+            self.tile_renderer = None
+        self.__tile_signature = None
+
+    @property
+    def output_data(self):
+        return self.__output_data
+
+    def get_nearest_data_point(self, p, data_points):
+        nearest_distance = sys.float_info.max
+        nearest_data_point = None
+        for data_point in data_points:
+            distance = length(data_point.pos - p)
+            if distance < nearest_distance:
+                nearest_distance = distance
+                nearest_data_point = data_point
+        return nearest_data_point
+
+
+def setup_demo_scene(ray_tracer):
+    """the demo scene, a cube above a floor lit by two point lights
+
+    returns the center cube, the only object that moves
+    """
+    ray_tracer.render_camera = Camera()
+    eye = vector3(2, 2, 0.8)
+
+    ray_tracer.render_camera.matrix.look_at(eye, vector3(), vector3(0, 1, 0))
+
+    light = PointLight()
+    light.name = "p1"
+    light.translate(2, 2, -2)
+    light.color = np.array([1.0, 0.64, 0.18])
+    ray_tracer.objects.append(light)
+
+    light = PointLight()
+    light.name = "p2"
+    light.translate(-2, 5, 0)
+    light.color = np.array([0.368, 156.0 / 255.0, 242.0 / 255.0])
+    ray_tracer.objects.append(light)
+
+    cube = Cube()
+    cube.object_color = vector3(0.2, 0.8, 0.3)
+    cube.name = "center"
+    cube.matrix.translate(0, 0, 0)
+    ray_tracer.objects.append(cube)
+
+    floor = Cube()
+    floor.name = "floor"
+    floor.matrix.scale(6.0, 0.2, 6.0)
+    floor.matrix.translate(0, -3.0, 0)
+    floor.object_color = vector3(0.8, 0.3, 0.2)
+    floor.calculate()
+    ray_tracer.objects.append(floor)
+    return cube
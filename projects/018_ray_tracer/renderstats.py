@@ -0,0 +1,129 @@
+"""per frame render statistics and profiling of the ray tracer
+"""
+import contextlib
+import cProfile
+import io
+import os
+import pstats
+import time
+
+from batchtracer import RayCounters
+
+# render phases in the order they run in a frame
+PHASES = ('ray generation', 'bvh', 'intersect', 'shade', 'output')
+
+
+def write_profile(profile, path, sort_by='cumulative'):
+    """write a cProfile dump to path and a readable report next to it
+    """
+    directory = os.path.dirname(path)
+    if directory and not os.path.isdir(directory):
+        os.makedirs(directory)
+    profile.dump_stats(path)
+    stream = io.StringIO()
+    pstats.Stats(profile, stream=stream).sort_stats(sort_by).print_stats()
+    with open(os.path.splitext(path)[0] + '.txt', 'w') as f:
+        f.write(stream.getvalue())
+
+
+def profile_it(path):
+    """decorator that profiles every call of the function into path
+    """
+    def decorator(func):
+        def wrapped(*args, **kwargs):
+            profile = cProfile.Profile()
+            profile.enable()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                profile.disable()
+                write_profile(profile, path)
+        return wrapped
+    return decorator
+
+
+class RenderStats(object):
+    """ray counts, intersection work and phase timings of the last frame
+
+    set profile_dir to write a cProfile dump of every frame in it
+    """
+
+    def __init__(self):
+        self.counters = RayCounters()
+        self.frame = 0
+        self.frame_seconds = 0.0
+        self.profile_dir = None
+        self.__frame_start = None
+        self.__profile = None
+
+    @property
+    def fps(self):
+        if not self.frame_seconds:
+            return 0.0
+        return 1.0 / self.frame_seconds
+
+    def begin_frame(self):
+        self.counters.reset()
+        self.__frame_start = time.time()
+        if self.profile_dir is not None:
+            self.__profile = cProfile.Profile()
+            self.__profile.enable()
+
+    def end_frame(self):
+        if self.__profile is not None:
+            self.__profile.disable()
+            write_profile(self.__profile, os.path.join(
+                self.profile_dir, 'frame_{:04d}.prof'.format(self.frame)))
+            self.__profile = None
+        if self.__frame_start is not None:
+            self.frame_seconds = time.time() - self.__frame_start
+        self.__frame_start = None
+        self.frame += 1
+
+    @contextlib.contextmanager
+    def phase(self, name):
+        """time the body of the with statement as a render phase
+        """
+        start = time.time()
+        try:
+            yield
+        finally:
+            self.counters.add_time(name, time.time() - start)
+
+    def phase_seconds(self):
+        """[(phase, seconds)] of the known phases followed by any other
+        """
+        seconds = self.counters.seconds
+        phases = [(phase, seconds.get(phase, 0.0)) for phase in PHASES]
+        phases += sorted((phase, value) for phase, value in seconds.items()
+                         if phase not in PHASES)
+        return phases
+
+    def as_dict(self):
+        counters = self.counters
+        data = {
+            'frame': self.frame,
+            'frame_seconds': self.frame_seconds,
+            'primary_rays': counters.primary,
+            'shadow_rays': counters.shadow,
+            'reflection_rays': counters.reflection,
+            'triangle_tests': counters.triangle_tests,
+            'bbox_rejections': counters.bbox_rejections,
+        }
+        for phase, seconds in self.phase_seconds():
+            data[phase.replace(' ', '_') + '_seconds'] = seconds
+        return data
+
+    def lines(self):
+        """human readable summary, one string per line
+        """
+        counters = self.counters
+        return [
+            "{:.1f} ms | {} rays | {} primary | {} shadow | {} reflection".format(
+                self.frame_seconds * 1000.0, counters.total, counters.primary,
+                counters.shadow, counters.reflection),
+            "{} triangle tests | {} bbox rejections".format(
+                counters.triangle_tests, counters.bbox_rejections),
+            " | ".join("{} {:.1f} ms".format(phase, seconds * 1000.0)
+                       for phase, seconds in self.phase_seconds()),
+        ]
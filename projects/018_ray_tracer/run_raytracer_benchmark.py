@@ -0,0 +1,107 @@
+"""per ray cost of the ray tracer math
+
+compares the Moller-Trumbore test on QVector3D (when PySide2 is installed)
+with the numpy scalar path and the batched path, and times a full frame
+"""
+import timeit
+
+from raymath import vector3
+from raytracer import RayTracer, Ray, Cube, PointLight
+
+REPEAT = 5
+NUMBER = 2000
+
+
+def best_per_call(statement, number=NUMBER):
+    return min(timeit.repeat(statement, repeat=REPEAT, number=number)) / number
+
+
+def qt_intersect_triangle(ray_pos, ray_direction, vertex0, vertex1, vertex2):
+    """the QVector3D version of RayTracer.intersect_triangle, as reference
+    """
+    from PySide2 import QtGui
+    edge1 = vertex1 - vertex0
+    edge2 = vertex2 - vertex0
+    h = QtGui.QVector3D.crossProduct(ray_direction, edge2)
+    a = QtGui.QVector3D.dotProduct(edge1, h)
+    if -0.0000001 < a < 0.0000001:
+        return None
+    f = 1 / a
+    s = ray_pos - vertex0
+    u = f * QtGui.QVector3D.dotProduct(s, h)
+    if u < 0.0 or u > 1.0:
+        return None
+    q = QtGui.QVector3D.crossProduct(s, edge1)
+    v = f * QtGui.QVector3D.dotProduct(ray_direction, q)
+    if v < 0.0 or u + v > 1.0:
+        return None
+    t = f * QtGui.QVector3D.dotProduct(edge2, q)
+    if t > 0.0000001:
+        return ray_pos + ray_direction * t
+    return None
+
+
+def setup_scene(resolution):
+    ray_tracer = RayTracer()
+    ray_tracer.render_resolution = (resolution, resolution)
+    ray_tracer.render_camera.matrix.look_at(vector3(2, 2, 0.8), vector3(),
+                                            vector3(0, 1, 0))
+    light = PointLight()
+    light.translate(2, 2, -2)
+    ray_tracer.objects.append(light)
+
+    cube = Cube()
+    ray_tracer.objects.append(cube)
+    floor = Cube()
+    floor.matrix.scale(6.0, 0.2, 6.0)
+    floor.matrix.translate(0, -3.0, 0)
+    floor.calculate()
+    ray_tracer.objects.append(floor)
+
+    ray_tracer.update_rays()
+    ray_tracer.start()
+    return ray_tracer
+
+
+def benchmark_triangle(ray_tracer):
+    tri = Cube().tris[0]
+    ray = Ray(vector3(0.2, 0.2, 5.0), vector3(0.0, 0.0, -1.0))
+    results = []
+    try:
+        from PySide2 import QtGui
+    except ImportError:
+        QtGui = None
+    if QtGui is not None:
+        args = (QtGui.QVector3D(*ray.pos), QtGui.QVector3D(*ray.direction),
+                QtGui.QVector3D(*tri.world_v0),
+                QtGui.QVector3D(*tri.world_v1),
+                QtGui.QVector3D(*tri.world_v2))
+        results.append(('QVector3D', best_per_call(
+            lambda: qt_intersect_triangle(*args))))
+    results.append(('numpy scalar', best_per_call(
+        lambda: ray_tracer.intersect_triangle(ray, tri))))
+    return results
+
+
+def benchmark_frame(ray_tracer):
+    width, height = ray_tracer.render_resolution
+    total_rays = width * height
+    results = []
+    for batched in (False, True):
+        ray_tracer.batched = batched
+        seconds = best_per_call(ray_tracer.render, number=1)
+        name = 'batched frame' if batched else 'scalar frame'
+        results.append((name, seconds / total_rays))
+    return results
+
+
+def main():
+    ray_tracer = setup_scene(32)
+    print("{:<16} {:>14}".format("path", "us per ray"))
+    for name, seconds in benchmark_triangle(ray_tracer) + benchmark_frame(
+            ray_tracer):
+        print("{:<16} {:>14.3f}".format(name, seconds * 1e6))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,179 @@
+"""render the ray tracer demo scene without a display
+
+    python run_raytracer_headless.py --width 256 --height 256 --frames 30 \\
+        --output raytracer.gif
+
+writes a png per frame or a single animated gif and prints the timing and
+ray counts of every frame
+"""
+import argparse
+import os
+import time
+
+import imageio
+import numpy as np
+
+from antialias import SAMPLES_PER_AXIS, COLOR_THRESHOLD
+from meshloader import load_mesh
+from raytracer import RayTracer, MeshInstance, setup_demo_scene
+
+# degrees the cube turns every frame, same as the widget
+ROTATION_STEP = 1.0
+# seconds between polls of the tile renderer
+POLL_INTERVAL = 0.005
+
+
+def parse_args(args=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--width', type=int, default=128)
+    parser.add_argument('--height', type=int, default=128)
+    parser.add_argument('--frames', type=int, default=1)
+    parser.add_argument('--rotation', type=float, default=ROTATION_STEP,
+                        help='degrees the cube turns every frame')
+    parser.add_argument('--mesh',
+                        help='.obj or .ply mesh rendered instead of the cube')
+    parser.add_argument('--output',
+                        help='.gif for an animation, otherwise a png per '
+                             'frame numbered when rendering several frames')
+    parser.add_argument('--no-shadows', action='store_true')
+    parser.add_argument('--no-reflections', action='store_true')
+    parser.add_argument('--scalar', action='store_true',
+                        help='trace ray by ray instead of batched')
+    parser.add_argument('--no-cache', action='store_true',
+                        help='trace every pixel instead of only the pixels '
+                             'affected by the moving cube')
+    parser.add_argument('--aa', action='store_true',
+                        help='adaptive anti-aliasing on the edges of the batched '
+                             'render')
+    parser.add_argument('--aa-samples', type=int, default=SAMPLES_PER_AXIS,
+                        help='extra samples per axis of an edge pixel')
+    parser.add_argument('--aa-threshold', type=float,
+                        default=COLOR_THRESHOLD,
+                        help='color difference between neighbours that '
+                             'makes an edge')
+    parser.add_argument('--aa-budget', type=int, default=None,
+                        help='maximum extra rays per frame')
+    parser.add_argument('--tiled', action='store_true',
+                        help='render the tiles on a process pool')
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--stats', action='store_true',
+                        help='print triangle tests and phase timings of '
+                             'every frame')
+    parser.add_argument('--profile', metavar='DIR',
+                        help='write a cProfile dump of every frame to DIR')
+    args = parser.parse_args(args)
+    if args.aa and args.tiled:
+        parser.error('--aa is not applied by the tile renderer, pass only '
+                     'one of --aa and --tiled')
+    if args.aa and args.scalar:
+        parser.error('--aa is only applied by the batched render, pass only '
+                     'one of --aa and --scalar')
+    return args
+
+
+def to_image(output_data):
+    """8 bit rgb image of a float (h, w, 3) output buffer
+    """
+    return (np.clip(output_data, 0.0, 1.0) * 255.0 + 0.5).astype(np.uint8)
+
+
+def frame_path(output, frame, total_frames):
+    if total_frames == 1:
+        return output
+    root, ext = os.path.splitext(output)
+    return '{}_{:04d}{}'.format(root, frame, ext or '.png')
+
+
+def replace_cube(ray_tracer, cube, mesh):
+    """put an instance of the mesh, scaled to the size of the cube, in its
+    place
+    """
+    instance = MeshInstance(mesh)
+    instance.object_color = cube.object_color
+    size = (mesh.bounds_max - mesh.bounds_min).max()
+    if size > 0.0:
+        instance.matrix.scale(2.0 / size)
+    instance.matrix.translate(-(mesh.bounds_min + mesh.bounds_max) / 2.0)
+    instance.calculate()
+    ray_tracer.objects[ray_tracer.objects.index(cube)] = instance
+    return instance
+
+
+def render_frame(ray_tracer, tiled):
+    if not tiled:
+        ray_tracer.render()
+        return
+    while not ray_tracer.render_tiles():
+        time.sleep(POLL_INTERVAL)
+
+
+def main(args=None):
+    args = parse_args(args)
+
+    ray_tracer = RayTracer()
+    ray_tracer.render_resolution = (args.width, args.height)
+    ray_tracer.enabled_shadows = not args.no_shadows
+    ray_tracer.enabled_reflections = not args.no_reflections
+    ray_tracer.batched = not args.scalar
+    ray_tracer.use_occlusion_cache = not args.no_cache
+    ray_tracer.antialiasing = args.aa
+    ray_tracer.sampler.samples_per_axis = args.aa_samples
+    ray_tracer.sampler.threshold = args.aa_threshold
+    ray_tracer.sampler.budget = args.aa_budget
+    ray_tracer.workers = args.workers
+    ray_tracer.stats.profile_dir = args.profile
+    cube = setup_demo_scene(ray_tracer)
+    if args.mesh is not None:
+        mesh = load_mesh(args.mesh)
+        print("{}: {} triangles".format(args.mesh, len(mesh)))
+        cube = replace_cube(ray_tracer, cube, mesh)
+
+    ray_tracer.update_rays()
+    ray_tracer.start()
+
+    as_gif = args.output is not None and args.output.lower().endswith('.gif')
+    images = []
+    total_seconds = 0.0
+    total_rays = 0
+    print("{:>5} {:>10} {:>12} {:>10} {:>10} {:>10} {:>10}".format(
+        "frame", "ms", "rays/s", "primary", "shadow", "reflection", "aa"))
+    try:
+        for frame in range(args.frames):
+            start = time.time()
+            render_frame(ray_tracer, args.tiled)
+            seconds = time.time() - start
+            counters = ray_tracer.counters
+            total_seconds += seconds
+            total_rays += counters.total
+            extra_rays = 0
+            if ray_tracer.antialiasing and ray_tracer.batched:
+                extra_rays = ray_tracer.sampler.extra_rays
+            print("{:>5} {:>10.1f} {:>12.0f} {:>10} {:>10} {:>10} {:>10}".format(
+                frame, seconds * 1000.0, counters.total / seconds,
+                counters.primary, counters.shadow, counters.reflection,
+                extra_rays))
+            if args.stats:
+                for line in ray_tracer.stats.lines():
+                    print("      " + line)
+
+            if args.output is not None:
+                image = to_image(ray_tracer.output_data)
+                if as_gif:
+                    images.append(image)
+                else:
+                    imageio.imwrite(frame_path(args.output, frame,
+                                               args.frames), image)
+
+            cube.matrix.rotate(args.rotation, 0, 1, 0)
+            cube.calculate()
+    finally:
+        ray_tracer.stop()
+
+    if images:
+        imageio.mimsave(args.output, images)
+    print("{} frames in {:.2f} s, {:.0f} rays/s".format(
+        args.frames, total_seconds, total_rays / total_seconds))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,214 @@
+"""incremental rendering for scenes where most geometry is static
+
+The cache keeps the color of every pixel together with all rays of its ray
+tree (primary, shadow and reflection rays). When a geometry moves only the
+pixels with a ray passing through the world space bounds it had before or
+after the move are traced again, the rest of the frame is reused.
+"""
+import numpy as np
+
+from batchtracer import NO_HIT, trace_rays
+
+# grow the bounds a little so hits exactly on a face count as inside
+BOUNDS_PADDING = 1e-6
+
+
+def inverse_directions(directions):
+    with np.errstate(divide='ignore'):
+        return 1.0 / directions
+
+
+def rays_hit_box(origins, inverse, lengths, box_min, box_max):
+    """True for every (n, 3) ray that passes through the box before it has
+    travelled lengths times its direction
+    """
+    with np.errstate(invalid='ignore'):
+        t0 = (box_min - origins) * inverse
+        t1 = (box_max - origins) * inverse
+    # fmin/fmax skip the nan of a zero direction on the slab boundary
+    near = np.fmin(t0, t1)
+    far = np.fmax(t0, t1)
+    t_near = np.fmax(np.fmax(near[:, 0], near[:, 1]), near[:, 2])
+    t_far = np.fmin(np.fmin(far[:, 0], far[:, 1]), far[:, 2])
+    return (t_near <= t_far) & (t_far >= 0.0) & (t_near <= lengths)
+
+
+class RayRecord(object):
+    """rays of the ray trees of one trace_rays call
+
+    visible and occluder hold the light visibility of the primary hit of
+    every ray and the geometry id blocking the light, NO_HIT when lit
+    """
+
+    def __init__(self, total_rays, total_lights):
+        self.visible = np.ones((total_rays, total_lights), dtype=bool)
+        self.occluder = np.full((total_rays, total_lights), NO_HIT,
+                                dtype=np.int64)
+        self.__ray_ids = []
+        self.__origins = []
+        self.__directions = []
+        self.__lengths = []
+
+    def add_rays(self, ray_ids, origins, directions, lengths):
+        """rays ending after lengths times their direction, inf on a miss
+        """
+        self.__ray_ids.append(ray_ids)
+        self.__origins.append(origins)
+        self.__directions.append(directions)
+        self.__lengths.append(lengths)
+
+    def add_shadow_rays(self, ray_ids, light_index, depth, origins,
+                        directions, occluder):
+        # any hit along the whole shadow ray blocks the light, so the ray
+        # depends on everything behind the light as well
+        self.add_rays(ray_ids, origins, directions,
+                      np.full(len(ray_ids), np.inf))
+        if depth == 0:
+            self.visible[ray_ids, light_index] = occluder == NO_HIT
+            self.occluder[ray_ids, light_index] = occluder
+
+    def rays(self):
+        """ray ids, origins, directions and lengths of all recorded rays
+        """
+        if not self.__ray_ids:
+            return (np.zeros(0, dtype=np.int64), np.zeros((0, 3)),
+                    np.zeros((0, 3)), np.zeros(0))
+        return (np.concatenate(self.__ray_ids),
+                np.concatenate(self.__origins),
+                np.concatenate(self.__directions),
+                np.concatenate(self.__lengths))
+
+
+class OcclusionCache(object):
+    """per pixel colors, primary hit triangles, light visibility and ray
+    trees of the last frame
+    """
+
+    def __init__(self):
+        self.colors = None
+        self.tri_indices = None
+        self.visible = None
+        self.occluder = None
+        # pixels traced by the last render call
+        self.traced_pixels = 0
+        self.__ray_pixels = None
+        self.__ray_origins = None
+        self.__ray_inverse_directions = None
+        self.__ray_lengths = None
+        self.__primary_origins = None
+        self.__primary_directions = None
+        self.__settings = None
+        self.__geometry_colors = None
+        self.__light_positions = None
+        self.__light_colors = None
+        self.__matrices = []
+        self.__bounds = None
+
+    def invalidate(self):
+        self.colors = None
+
+    def is_valid(self, scene, origins, directions, matrices, settings):
+        """True when the cached frame can be updated incrementally
+        """
+        if self.colors is None:
+            return False
+        # the ray grid is only recalculated when the camera or resolution
+        # changes, so a new array means every primary ray changed
+        if (origins is not self.__primary_origins or
+                directions is not self.__primary_directions):
+            return False
+        if settings != self.__settings or len(matrices) != len(
+                self.__matrices):
+            return False
+        return (np.array_equal(scene.geometry_colors,
+                               self.__geometry_colors) and
+                np.array_equal(scene.light_positions,
+                               self.__light_positions) and
+                np.array_equal(scene.light_colors, self.__light_colors))
+
+    def dirty_pixels(self, matrices, bounds):
+        """boolean mask of the pixels involving a geometry that moved
+        """
+        dirty = np.zeros(len(self.colors), dtype=bool)
+        old_min, old_max = self.__bounds
+        new_min, new_max = bounds
+        for geometry_id, matrix in enumerate(matrices):
+            if matrix == self.__matrices[geometry_id]:
+                continue
+            # a single test against the union of the old and new bounds,
+            # they mostly overlap for an object moving between frames
+            box_min = np.minimum(old_min[geometry_id], new_min[geometry_id])
+            box_max = np.maximum(old_max[geometry_id], new_max[geometry_id])
+            hit = rays_hit_box(self.__ray_origins,
+                               self.__ray_inverse_directions,
+                               self.__ray_lengths, box_min - BOUNDS_PADDING,
+                               box_max + BOUNDS_PADDING)
+            dirty[self.__ray_pixels[hit]] = True
+        return dirty
+
+    def render(self, scene, origins, directions, matrices, bounds,
+               shadows=True, reflections=True, counters=None):
+        """colors of the (n, 3) primary rays, only tracing the pixels whose
+        ray tree passes through a geometry that moved
+
+        matrices are the world matrices of every geometry id of the scene and
+        bounds their world space (min, max) arrays, see
+        TriangleBatch.geometry_bounds
+        """
+        settings = (shadows, reflections)
+        flat_origins = origins.reshape(-1, 3)
+        flat_directions = directions.reshape(-1, 3)
+        total_rays = len(flat_origins)
+        total_lights = len(scene.light_positions)
+
+        if not self.is_valid(scene, origins, directions, matrices, settings):
+            pixels = np.arange(total_rays)
+            self.colors = np.zeros((total_rays, 3))
+            self.tri_indices = np.full(total_rays, NO_HIT, dtype=np.int64)
+            self.visible = np.ones((total_rays, total_lights), dtype=bool)
+            self.occluder = np.full((total_rays, total_lights), NO_HIT,
+                                    dtype=np.int64)
+            keep = np.zeros(0, dtype=bool)
+            self.__ray_pixels = np.zeros(0, dtype=np.int64)
+            self.__ray_origins = np.zeros((0, 3))
+            self.__ray_inverse_directions = np.zeros((0, 3))
+            self.__ray_lengths = np.zeros(0)
+        else:
+            dirty = self.dirty_pixels(matrices, bounds)
+            pixels = np.flatnonzero(dirty)
+            keep = ~dirty[self.__ray_pixels]
+
+        record = RayRecord(len(pixels), total_lights)
+        hits = np.empty(len(pixels), dtype=np.int64)
+        self.colors[pixels] = trace_rays(scene, flat_origins[pixels],
+                                         flat_directions[pixels],
+                                         shadows=shadows,
+                                         reflections=reflections,
+                                         counters=counters, record=record,
+                                         hits=hits)
+        self.tri_indices[pixels] = hits
+        self.visible[pixels] = record.visible
+        self.occluder[pixels] = record.occluder
+
+        # replace the ray trees of the traced pixels
+        ray_ids, ray_origins, ray_directions, ray_lengths = record.rays()
+        self.__ray_pixels = np.concatenate((self.__ray_pixels[keep],
+                                            pixels[ray_ids]))
+        self.__ray_origins = np.concatenate((self.__ray_origins[keep],
+                                             ray_origins))
+        self.__ray_inverse_directions = np.concatenate(
+            (self.__ray_inverse_directions[keep],
+             inverse_directions(ray_directions)))
+        self.__ray_lengths = np.concatenate((self.__ray_lengths[keep],
+                                             ray_lengths))
+
+        self.traced_pixels = len(pixels)
+        self.__primary_origins = origins
+        self.__primary_directions = directions
+        self.__settings = settings
+        self.__geometry_colors = scene.geometry_colors.copy()
+        self.__light_positions = scene.light_positions.copy()
+        self.__light_colors = scene.light_colors.copy()
+        self.__matrices = [matrix.copy() for matrix in matrices]
+        self.__bounds = (bounds[0].copy(), bounds[1].copy())
+        return self.colors
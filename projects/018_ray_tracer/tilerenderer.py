@@ -0,0 +1,123 @@
+"""multi process tiled rendering of a SceneBatch
+
+The frame is split in tiles which are traced by a process pool, finished tiles
+are copied into the output buffer as they come in so the frame can be shown
+progressively.
+"""
+import os
+import pickle
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from batchtracer import RayCounters, trace_rays
+
+TILE_SIZE = 32
+
+# last scene unpickled by this worker process, keyed on its frame id
+_worker_scene = {}
+
+
+def split_tiles(width, height, tile_size=TILE_SIZE):
+    """(x, y, width, height) of every tile covering the frame
+    """
+    tiles = []
+    for y in range(0, height, tile_size):
+        for x in range(0, width, tile_size):
+            tiles.append((x, y, min(tile_size, width - x),
+                          min(tile_size, height - y)))
+    return tiles
+
+
+def render_tile(frame_id, scene_data, origins, directions, shadows=True,
+                reflections=True):
+    """trace the (h, w, 3) rays of one tile, runs in a worker process
+
+    the pickled scene is the same for every tile of a frame, so every worker
+    only unpickles it once per frame. Returns the colors and RayCounters of
+    the tile.
+    """
+    scene = _worker_scene.get(frame_id)
+    if scene is None:
+        _worker_scene.clear()
+        scene = pickle.loads(scene_data)
+        _worker_scene[frame_id] = scene
+    counters = RayCounters()
+    colors = trace_rays(scene, origins, directions, shadows=shadows,
+                        reflections=reflections, counters=counters)
+    return colors.reshape(origins.shape), counters
+
+
+class TileRenderer(object):
+    """schedules the tiles of a frame on a process pool
+    """
+
+    def __init__(self, workers=None, tile_size=TILE_SIZE):
+        self.workers = workers
+        self.tile_size = tile_size
+        self.frame = 0
+        self.frame_start = 0.0
+        self.total_tiles = 0
+        self.finished_tiles = 0
+        self.counters = RayCounters()
+        self.__executor = None
+        self.__pending = {}
+
+    @property
+    def is_busy(self):
+        return bool(self.__pending)
+
+    def start_frame(self, scene, ray_origins, ray_directions, shadows=True,
+                    reflections=True):
+        """cancel the frame in flight and dispatch all tiles of a new one
+
+        ray_origins and ray_directions are (h, w, 3) arrays
+        """
+        self.cancel()
+        if self.__executor is None:
+            self.__executor = ProcessPoolExecutor(max_workers=self.workers)
+
+        self.frame += 1
+        self.frame_start = time.time()
+        frame_id = (os.getpid(), id(self), self.frame)
+        scene_data = pickle.dumps(scene, protocol=pickle.HIGHEST_PROTOCOL)
+
+        height, width = ray_origins.shape[:2]
+        tiles = split_tiles(width, height, self.tile_size)
+        self.total_tiles = len(tiles)
+        self.finished_tiles = 0
+        self.counters.reset()
+        for tile in tiles:
+            x, y, tile_width, tile_height = tile
+            future = self.__executor.submit(
+                render_tile, frame_id, scene_data,
+                ray_origins[y:y + tile_height, x:x + tile_width],
+                ray_directions[y:y + tile_height, x:x + tile_width],
+                shadows, reflections)
+            self.__pending[future] = tile
+
+    def poll(self, output_data):
+        """copy every finished tile into the (h, w, 3) output buffer
+
+        returns the amount of tiles that came in
+        """
+        finished = [future for future in self.__pending if future.done()]
+        for future in finished:
+            x, y, tile_width, tile_height = self.__pending.pop(future)
+            colors, counters = future.result()
+            output_data[y:y + tile_height, x:x + tile_width] = colors
+            self.counters.add(counters)
+        self.finished_tiles += len(finished)
+        return len(finished)
+
+    def cancel(self):
+        """drop the frame in flight, tiles already running are ignored
+        """
+        for future in self.__pending:
+            future.cancel()
+        self.__pending = {}
+
+    def shutdown(self):
+        self.cancel()
+        if self.__executor is not None:
+            self.__executor.shutdown(wait=False)
+            self.__executor = None
@@ -1,12 +1,18 @@
 """ann
 """
 import json
+import os
 import random
+import sys
 
 from PySide2 import QtGui, QtCore, QtWidgets
 from PySide2.QtWidgets import QFileDialog
 
-from neuralnetwork import Network, NetworkPainter
+# the shared neuralnetwork package is in the projects directory
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+
+from neuralnetwork import Network
+from neuralnetwork.painter import NetworkPainter
 
 
 class NeuralNetworkDemoWidget(QtWidgets.QWidget):
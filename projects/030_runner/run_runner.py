@@ -1,13 +1,19 @@
 """
 base Runner
 """
+import os
 import random
+import sys
 
 import math
 from PySide2 import QtGui, QtCore, QtWidgets
 from PySide2.QtCore import QRect
 
-from neuralnetwork import Network, NetworkPainter
+# the shared neuralnetwork package is in the projects directory
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+
+from neuralnetwork import Network, NetworkBatch
+from neuralnetwork.painter import NetworkPainter
 from runner import Runner
 from runner import RunnerPainter
 
@@ -39,18 +45,24 @@ class PhenoType:
     def __init__(self, dna):
         self.dna = dna
         self.network = Network(3, [10, 10, 10], 3)
+        self.network.setup()
         self.network.import_weights(dna.value)
         self.runner = Runner()
         self.is_running = False
         self.fitness = 0
 
-    def tick_neural_network(self):
-        data = [
+    def network_inputs(self):
+        return [
             self.runner.player.pos.x(),
             self.runner.player.pos.y(),
             self.runner.distance_next_obstacle()
         ]
-        self.network.respond(data)
+
+    def tick_neural_network(self):
+        self.network.respond(self.network_inputs())
+        self.apply_network_decision()
+
+    def apply_network_decision(self):
         outputs = [n.output for n in self.network.output_layer]
         if not outputs:
             return
@@ -74,6 +86,9 @@ class PhenoType:
     def tick(self):
         self.runner.tick()
         self.tick_neural_network()
+        self.update_fitness()
+
+    def update_fitness(self):
         self.is_running = not self.runner.stopped
         if not self.runner.stopped:
             self.fitness += math.floor(
@@ -97,6 +112,8 @@ class GeneticAlgorithm:
         self.pauzed = False
         self.state = self.START
         self.pheno_types = []
+        # NetworkBatch of the networks of the pheno types
+        self.network_batch = None
 
     def setup(self):
         self.structure_network.setup()
@@ -119,6 +136,7 @@ class GeneticAlgorithm:
             pheno_type = PhenoType(dna)
             self.pheno_types.append(pheno_type)
             pheno_type.start()
+        self.network_batch = NetworkBatch([p.network for p in self.pheno_types])
 
     def get_fittest_dna(self):
         fittest_dna = sorted(self.population, key=lambda x: x.fitness)
@@ -173,9 +191,14 @@ class GeneticAlgorithm:
 
         if self.state == self.GENERATING_FITNESS:
 
+            # PhenoType.tick with the networks responding in one batch
+            for pheno_type in self.pheno_types:
+                pheno_type.runner.tick()
+            self.network_batch.respond([p.network_inputs() for p in self.pheno_types])
             all_done = True
             for pheno_type in self.pheno_types:
-                pheno_type.tick()
+                pheno_type.apply_network_decision()
+                pheno_type.update_fitness()
                 if pheno_type.is_running:
                     all_done = False
             if all_done:
@@ -288,13 +311,13 @@ class RunnerDemoWidget(QtWidgets.QWidget):
         self.runner_painter = RunnerPainter(self.runner, self.rect())
 
         self.network = Network(3, [10, 10, 10], 3)
+        self.network.setup()
         self.runner_ai = RunnerAI(self.network)
         self.runner_ai.on_training_finished = self.training_finished
         self.runner_ai.setup()
         self.network_painter = NetworkPainter(self.network)
         self.network_painter.rect = QRect(0, 0, self.width() / 2,
                                           self.height() / 2)
-        self.network.setup()
         self.runner_trainer = RunnerTrainer(self.network, self.runner)
         self.genetic_algorithm = GeneticAlgorithm()
         self.genetic_algorithm.setup()
@@ -1,6 +1,8 @@
 """
 """
+import os
 import random
+import sys
 
 from PySide2 import QtCore
 
@@ -11,7 +13,11 @@ from PySide2.QtGui import QPainter
 from PySide2.QtGui import QPen
 from PySide2.QtWidgets import QWidget, QApplication
 
-from neuralnetwork import Network, NetworkPainter
+# the shared neuralnetwork package is in the projects directory
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+
+from neuralnetwork import Network, NetworkBatch
+from neuralnetwork.painter import NetworkPainter
 from snake import SnakeGame
 from charts import LineChart
 
@@ -145,14 +151,25 @@ class SnakePhenotype(object):
 
         return inputs
 
+    def tick_snake(self):
+        """move the snake, returns the network inputs of its new position
+        """
+        self.snake.tick()
+        self.snake_tick_count += 1
+        return SnakePhenotype.get_network_response(self.snake)
+
     def tick(self):
         if self.is_finished:
             return
 
-        self.snake.tick()
-        self.snake_tick_count += 1
-        response = SnakePhenotype.get_network_response(self.snake)
+        response = self.tick_snake()
         self.network.respond(response)
+        self.apply_response()
+
+    def apply_response(self):
+        """steer the snake with the outputs of the network and update the
+        fitness
+        """
         SnakePhenotype.apply_network_decision(self.network, self.snake)
         self.is_finished = self.snake.game_over
         self.has_won = self.snake.game_won
@@ -190,6 +207,8 @@ class SnakeGenetic(object):
         self.total_population = TOTAL_POPULATION
         self.population = []
         self.phenotypes = []
+        # NetworkBatch of the networks of the phenotypes
+        self.network_batch = None
         self.state = self.START
         self.best_phenotype = None
         self.generation_incremented_func = None
@@ -201,6 +220,7 @@ class SnakeGenetic(object):
         for dna in self.population:
             phenotype = SnakePhenotype(dna)
             self.phenotypes.append(phenotype)
+        self.network_batch = NetworkBatch([p.network for p in self.phenotypes])
 
     def get_best_phenotype(self):
         return self.best_phenotype
@@ -217,8 +237,16 @@ class SnakeGenetic(object):
             self.population.append(dna)
 
     def tick_phenotypes(self):
-        for phenotype in self.phenotypes:
-            phenotype.tick()
+        """tick the snakes that are not finished, their networks respond in
+        one batch
+        """
+        active = [i for i, phenotype in enumerate(self.phenotypes) if not phenotype.is_finished]
+        if not active:
+            return
+        responses = [self.phenotypes[i].tick_snake() for i in active]
+        self.network_batch.respond(responses, active)
+        for i in active:
+            self.phenotypes[i].apply_response()
 
     def pick_pheno_type(self, total_fitness):
         target = random.random()
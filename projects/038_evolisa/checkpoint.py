@@ -0,0 +1,77 @@
+"""checkpoints and run log of long EvoLisa evolutions
+
+A checkpoint is an .npz with the population matrix, the generation it is
+about to evaluate, the fitness resolution level with the best fitness
+history of that level and the state of the numpy Generator, so a resumed
+run continues where the checkpoint was taken. The
+run log is a csv with one appended row per generation.
+"""
+import csv
+import json
+import os
+
+import numpy as np
+
+LOG_FIELDS = ('generation', 'scale', 'best', 'mean', 'worst', 'best_full',
+              'fitness_seconds', 'generation_seconds')
+
+
+def save_checkpoint(path, population, generation, rng, level=0, history=()):
+    """write the checkpoint next to path first so a crash while writing
+    never leaves a broken checkpoint behind
+
+    history is the best fitness of every generation at the level, see
+    ResolutionSchedule.history
+    """
+    temp_path = path + '.tmp'
+    with open(temp_path, 'wb') as f:
+        np.savez(f, population=population, generation=generation,
+                 level=level, history=np.asarray(history, dtype=float),
+                 rng_state=json.dumps(rng.bit_generator.state))
+    os.replace(temp_path, path)
+
+
+def load_checkpoint(path):
+    """population, generation, Generator, resolution level and the history
+    of that level of a checkpoint
+    """
+    with np.load(path) as data:
+        population = data['population']
+        generation = int(data['generation'])
+        level = int(data['level']) if 'level' in data else 0
+        history = data['history'].tolist() if 'history' in data else []
+        state = json.loads(str(data['rng_state']))
+    bit_generator = getattr(np.random, state['bit_generator'])()
+    bit_generator.state = state
+    return (population, generation, np.random.Generator(bit_generator), level,
+            history)
+
+
+class RunLog(object):
+    """append only csv of the fitness and timings of every generation
+
+    best, mean and worst are scored at the resolution scale of the
+    generation, best_full is the best chromosone scored at full resolution
+    """
+
+    def __init__(self, path):
+        self.path = path
+        write_header = not os.path.exists(path) or not os.path.getsize(path)
+        self.__file = open(path, 'a', newline='')
+        self.__writer = csv.writer(self.__file)
+        if write_header:
+            self.__writer.writerow(LOG_FIELDS)
+            self.__file.flush()
+
+    def write(self, generation, scale, population_fitness, best_full,
+              fitness_seconds, generation_seconds):
+        self.__writer.writerow((
+            generation, scale, repr(float(np.max(population_fitness))),
+            repr(float(np.mean(population_fitness))),
+            repr(float(np.min(population_fitness))), repr(float(best_full)),
+            '{:.6f}'.format(fitness_seconds),
+            '{:.6f}'.format(generation_seconds)))
+        self.__file.flush()
+
+    def close(self):
+        self.__file.close()
@@ -0,0 +1,130 @@
+"""evolve EvoLisa triangles without a display
+
+    python evolisa_headless.py --target evolisa.png --generations 1000 \\
+        --output best.png --output-interval 50
+
+    python evolisa_headless.py --benchmark
+
+runs for a number of generations or a time budget, prints the progress and
+writes the best render to a png every output interval. --benchmark reports
+generations and fitness evaluations per second of a seeded run.
+"""
+import argparse
+import time
+
+import imageio
+
+from evolution import (TARGET_PATH, POPULATION_SIZE, TOTAL_TRIANGLES, MUTATION_RATE, CHECKPOINT_INTERVAL,
+                       Evolution)
+from resolution import SCALES, PLATEAU_GENERATIONS, PLATEAU_IMPROVEMENT, ResolutionSchedule
+
+# generations of a --benchmark run without --generations
+BENCHMARK_GENERATIONS = 20
+BENCHMARK_SEED = 0
+
+
+def parse_args(args=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--target', default=TARGET_PATH)
+    parser.add_argument('--width', type=int,
+                        help='defaults to the width of the target')
+    parser.add_argument('--height', type=int,
+                        help='defaults to the height of the target')
+    parser.add_argument('--population', type=int, default=POPULATION_SIZE)
+    parser.add_argument('--triangles', type=int, default=TOTAL_TRIANGLES)
+    parser.add_argument('--mutation-rate', type=float, default=MUTATION_RATE)
+    parser.add_argument('--workers', type=int, default=None,
+                        help='fitness processes, 1 to evaluate in process')
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('--generations', type=int, default=None)
+    parser.add_argument('--time-budget', type=float, default=None,
+                        help='seconds to evolve for')
+    parser.add_argument('--scales', default=','.join(str(scale) for scale in SCALES),
+                        help='comma separated fitness resolution scales, 1 to '
+                             'always score at full size')
+    parser.add_argument('--plateau-generations', type=int,
+                        default=PLATEAU_GENERATIONS)
+    parser.add_argument('--plateau-improvement', type=float,
+                        default=PLATEAU_IMPROVEMENT)
+    parser.add_argument('--output',
+                        help='png of the best chromosone, {generation} in the '
+                             'path is replaced by the generation')
+    parser.add_argument('--output-interval', type=int, default=50)
+    parser.add_argument('--checkpoint',
+                        help='.npz to resume from and save to')
+    parser.add_argument('--checkpoint-interval', type=int,
+                        default=CHECKPOINT_INTERVAL)
+    parser.add_argument('--log', help='csv of every generation')
+    parser.add_argument('--benchmark', action='store_true',
+                        help='seeded run without output that reports '
+                             'generations and fitness evaluations per second')
+    return parser.parse_args(args)
+
+
+def write_output(evolution, path, chromosone, generation):
+    imageio.imwrite(path.format(generation=generation),
+                    evolution.render(chromosone))
+
+
+def main(args=None):
+    args = parse_args(args)
+    if args.benchmark:
+        if args.seed is None:
+            args.seed = BENCHMARK_SEED
+        if args.generations is None and args.time_budget is None:
+            args.generations = BENCHMARK_GENERATIONS
+        args.output = args.checkpoint = args.log = None
+    if args.generations is None and args.time_budget is None:
+        raise SystemExit("pass --generations, --time-budget or --benchmark")
+
+    size = None
+    if args.width is not None or args.height is not None:
+        if args.width is None or args.height is None:
+            raise SystemExit("pass both --width and --height")
+        size = (args.width, args.height)
+    scales = [float(scale) for scale in args.scales.split(',')]
+    try:
+        schedule = ResolutionSchedule(scales, plateau_generations=args.plateau_generations,
+                                      plateau_improvement=args.plateau_improvement)
+    except ValueError as error:
+        raise SystemExit("--scales: {}".format(error))
+    evolution = Evolution(args.target, size=size, population_size=args.population,
+                          total_triangles=args.triangles, mutation_rate=args.mutation_rate,
+                          workers=args.workers, seed=args.seed, checkpoint_path=args.checkpoint,
+                          checkpoint_interval=args.checkpoint_interval, log_path=args.log,
+                          schedule=schedule)
+    if evolution.generation:
+        print("resumed {} at generation {}".format(args.checkpoint, evolution.generation))
+
+    start = time.time()
+    generations = 0
+    chromosone = generation = None
+    try:
+        while True:
+            if args.generations is not None and generations >= args.generations:
+                break
+            if args.time_budget is not None and time.time() - start >= args.time_budget:
+                break
+            step_start = time.time()
+            chromosone, generation = evolution.step()
+            generations += 1
+            if not args.benchmark:
+                print("{:>6} scale {:<5} fitness {:.5f} {:>8.1f} ms".format(
+                    generation, evolution.scale, evolution.best_fitness, (time.time() - step_start) * 1000.0))
+            if args.output is not None and generations % args.output_interval == 0:
+                write_output(evolution, args.output, chromosone, generation)
+    finally:
+        seconds = time.time() - start
+        evolution.close()
+
+    if args.output is not None and chromosone is not None:
+        write_output(evolution, args.output, chromosone, generation)
+    if args.benchmark:
+        print("{} generations of {} x {} triangles at {} x {}, seed {}".format(
+            generations, args.population, args.triangles, evolution.size[0], evolution.size[1], args.seed))
+    print("{:.2f} s, {:.2f} generations/s, {:.1f} fitness evaluations/s, best fitness {:.5f}".format(
+        seconds, generations / seconds, evolution.fitness_evaluations / seconds, evolution.best_fitness))
+
+
+if __name__ == '__main__':
+    main()
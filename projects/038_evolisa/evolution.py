@@ -0,0 +1,279 @@
+"""Qt free EvoLisa genetic algorithm
+
+The population is a (population, genes) matrix, TRIANGLE_SIZE genes per
+triangle. Evolution.step scores a generation and breeds the next one, the
+EvoLisaWorker in evolisa.py and the headless runner both drive it.
+"""
+import os
+import time
+
+import imageio
+import numpy as np
+
+from checkpoint import RunLog, save_checkpoint, load_checkpoint
+from fitness import FitnessPool, split_target, calculate_fitness
+from rasterizer import TRIANGLE_SIZE, Rasterizer
+from resolution import SCALES, ResolutionSchedule, downsample, target_pyramid
+
+TARGET_PATH = 'evolisa.png'
+WIDTH = 250
+HEIGHT = 250
+POPULATION_SIZE = 60
+TOTAL_TRIANGLES = 80
+MUTATION_RATE = 0.01
+# fitness processes, None for one per core and 1 to evaluate in process
+WORKERS = None
+# .npz the population is saved to every CHECKPOINT_INTERVAL generations
+# and resumed from when it exists, None to disable
+CHECKPOINT_PATH = None
+CHECKPOINT_INTERVAL = 50
+# csv with the fitness and timings of every generation, None to disable
+LOG_PATH = None
+
+
+def _initialize_population(size, total_triangles, rng):
+    """(size, genes) matrix with a chromosone per row
+    """
+    return rng.random((size, TRIANGLE_SIZE * total_triangles))
+
+
+def _read_target_phenotype(path=TARGET_PATH):
+    """8 bit rgba (height, width, 4) array of the image at path
+    """
+    image = np.asarray(imageio.imread(path))
+    if image.ndim == 2:
+        image = np.stack((image,) * 3, axis=-1)
+    if image.shape[2] == 3:
+        alpha = np.full(image.shape[:2] + (1,), 255, dtype=image.dtype)
+        image = np.concatenate((image, alpha), axis=-1)
+    return image
+
+
+def _fittest_population_indices(population_fitness):
+    """population indices from the highest to the lowest fitness
+    """
+    return np.argsort(-np.asarray(population_fitness), kind='stable')
+
+
+def _selection(fittest_indices, population_size, fitness_values, rng):
+    """the fittest chromosone and a fitness proportional draw from the
+    fitter half to fill half the population
+    """
+    total = population_size // 2
+    candidates = fittest_indices[:total]
+    weights = np.asarray(fitness_values)[candidates]
+    picked = rng.choice(candidates, size=max(total - 1, 0), p=weights / weights.sum())
+    return np.concatenate(([fittest_indices[0]], picked))
+
+
+def _cross_over(population, partners_a, partners_b):
+    """children with the first half of the genes of partners_a and the
+    second half of partners_b
+    """
+    half = population.shape[1] // 2
+    children = population[partners_a]
+    children[:, half:] = population[partners_b, half:]
+    return children
+
+
+def _pick_candidates(fitness_values, selected_indices, total, rng):
+    """total selected indices drawn by how far their fitness is above the
+    lowest fitness of the population
+    """
+    fitness_values = np.asarray(fitness_values)
+    weights = fitness_values[selected_indices] - fitness_values.min()
+    if weights.sum() <= 0.0:
+        return rng.choice(selected_indices, size=total)
+    return rng.choice(selected_indices, size=total, p=weights / weights.sum())
+
+
+def _generate_population(population, selected_indices, population_size, mutation_rate, total_triangles, fitness_values,
+                         rng):
+    """the next generation and for every chromosone the indices of the
+    chromosones it was bred from
+    """
+    total_new_random = 2
+    total_children = max(population_size - total_new_random - len(selected_indices), 0)
+    partners_a = _pick_candidates(fitness_values, selected_indices, total_children, rng)
+    partners_b = _pick_candidates(fitness_values, selected_indices, total_children, rng)
+
+    new_population = np.concatenate((population[selected_indices],
+                                     _cross_over(population, partners_a, partners_b),
+                                     _initialize_population(total_new_random, total_triangles, rng)))
+    _mutate_population(new_population, mutation_rate, rng)
+
+    lineage = [[i] for i in selected_indices]
+    lineage += [[a, b] for a, b in zip(partners_a, partners_b)]
+    lineage += [[] for _ in range(total_new_random)]
+    return new_population, lineage
+
+
+def _mutate_population(population, mutation_rate, rng):
+    """replace genes with new random values, the fittest chromosone in the
+    first row is kept as it is
+    """
+    mutations = rng.random(population.shape) < mutation_rate
+    mutations[0] = False
+    population[mutations] = rng.random(np.count_nonzero(mutations))
+
+
+class Evolution(object):
+    """state of one EvoLisa run
+
+    size defaults to the size of the target image, a target of another size
+    is resampled to it
+    """
+
+    def __init__(self, target_path=TARGET_PATH, size=None, population_size=POPULATION_SIZE,
+                 total_triangles=TOTAL_TRIANGLES, mutation_rate=MUTATION_RATE, workers=WORKERS, seed=None,
+                 checkpoint_path=CHECKPOINT_PATH, checkpoint_interval=CHECKPOINT_INTERVAL, log_path=LOG_PATH,
+                 schedule=None):
+        self.__rng = np.random.default_rng(seed)
+        target_phenotype = _read_target_phenotype(target_path) / 255.0
+        if size is None:
+            size = (target_phenotype.shape[1], target_phenotype.shape[0])
+        elif target_phenotype.shape[:2] != (size[1], size[0]):
+            target_phenotype = downsample(target_phenotype, size)
+        self.size = tuple(size)
+        self.target_path = target_path
+        self.population_size = population_size
+        self.total_triangles = total_triangles
+        self.mutation_rate = mutation_rate
+        self.workers = workers
+        # fitness evaluations so far, the population and the full size
+        # scores of the best chromosones at coarse levels
+        self.fitness_evaluations = 0
+
+        self.__fitness_pool = None
+        # coarse to fine fitness, the best chromosone is also scored at full
+        # size so the reported fitness stays comparable between levels
+        self.__schedule = schedule or ResolutionSchedule(SCALES)
+        self.__pyramid = target_pyramid(target_phenotype, self.size, self.__schedule.scales)
+        self.__full_target = split_target(target_phenotype)
+        self.__full_rasterizer = Rasterizer(self.size)
+        self.__best_fitness = 0.0
+        self.__scale = self.__schedule.scale
+
+        self.__population = _initialize_population(population_size, total_triangles, self.__rng)
+        self.__lineage = None
+        self.__generation = 0
+        self.__checkpoint_path = checkpoint_path
+        self.__checkpoint_interval = checkpoint_interval
+        self.__log_path = log_path
+        self.__log = None
+        if checkpoint_path is not None and os.path.exists(checkpoint_path):
+            self.resume(checkpoint_path)
+
+    @property
+    def generation(self):
+        """generation the next step evaluates
+        """
+        return self.__generation
+
+    @property
+    def best_fitness(self):
+        """full resolution fitness of the best chromosone of the last step
+        """
+        return self.__best_fitness
+
+    @property
+    def scale(self):
+        """resolution scale the last step was scored at
+        """
+        return self.__scale
+
+    @property
+    def population(self):
+        return self.__population
+
+    def resume(self, path):
+        """continue the run saved in the checkpoint at path
+        """
+        population, generation, rng, level, history = load_checkpoint(path)
+        if population.shape != self.__population.shape:
+            raise ValueError("checkpoint {} has a population of {}, expected {}".format(
+                path, population.shape, self.__population.shape))
+        self.__population = population
+        self.__generation = generation
+        self.__rng = rng
+        self.__lineage = None
+        self.__schedule.level = min(level, len(self.__schedule.scales) - 1)
+        self.__schedule.history = history if self.__schedule.level == level else []
+
+    def save_checkpoint(self, path=None):
+        save_checkpoint(path or self.__checkpoint_path, self.__population, self.__generation, self.__rng,
+                        level=self.__schedule.level, history=self.__schedule.history)
+
+    def render(self, chromosone):
+        """8 bit (height, width, 3) image of the chromosone at full size
+        """
+        image = self.__full_rasterizer.render(chromosone, self.total_triangles).transpose(1, 2, 0)
+        return (np.clip(image, 0.0, 1.0) * 255.0 + 0.5).astype(np.uint8)
+
+    def __calculate_population_fitness(self, population):
+        size, target = self.__pyramid[self.__schedule.level]
+        if self.__fitness_pool is not None and self.__fitness_pool.size != size:
+            self.__fitness_pool.close()
+            self.__fitness_pool = None
+        if self.__fitness_pool is None:
+            self.__fitness_pool = FitnessPool(target, size, self.population_size, workers=self.workers)
+        self.fitness_evaluations += self.population_size
+        return self.__fitness_pool.evaluate(population, self.total_triangles, lineage=self.__lineage)
+
+    def step(self):
+        """score the current generation and breed the next one
+
+        returns a copy of the fittest chromosone and its generation
+        """
+        if self.__log is None and self.__log_path is not None:
+            self.__log = RunLog(self.__log_path)
+        population_size = self.population_size
+        total_triangles = self.total_triangles
+        population = self.__population
+        generation = self.__generation
+
+        start = time.time()
+        population_fitness = self.__calculate_population_fitness(population)
+        fitness_seconds = time.time() - start
+
+        fittsest_indices = _fittest_population_indices(population_fitness)
+        fittest_index = fittsest_indices[0]
+
+        fitest_chromosone = np.copy(population[fittest_index])
+        self.__scale = self.__schedule.scale
+        if self.__schedule.is_final:
+            self.__best_fitness = population_fitness[fittest_index]
+        else:
+            self.__best_fitness = calculate_fitness(fitest_chromosone, total_triangles, self.size,
+                                                    self.__full_target, self.__full_rasterizer)
+            self.fitness_evaluations += 1
+        self.__schedule.update(population_fitness[fittest_index])
+
+        selected_indices = _selection(fittsest_indices, population_size, population_fitness, self.__rng)
+        new_population, lineage = _generate_population(population, selected_indices, population_size,
+                                                       self.mutation_rate, total_triangles, population_fitness,
+                                                       self.__rng)
+
+        if self.__log is not None:
+            self.__log.write(generation, self.__scale, population_fitness, self.__best_fitness, fitness_seconds,
+                             time.time() - start)
+
+        self.__population = new_population
+        self.__lineage = lineage
+        self.__generation += 1
+        if self.__checkpoint_path is not None and self.__generation % self.__checkpoint_interval == 0:
+            self.save_checkpoint()
+        return fitest_chromosone, generation
+
+    def close(self):
+        """save a last checkpoint and release the log file and the fitness
+        processes
+        """
+        if self.__checkpoint_path is not None:
+            self.save_checkpoint()
+        if self.__log is not None:
+            self.__log.close()
+            self.__log = None
+        if self.__fitness_pool is not None:
+            self.__fitness_pool.close()
+            self.__fitness_pool = None
@@ -0,0 +1,320 @@
+"""fitness of EvoLisa chromosones, in process or on a process pool
+
+Every chromosone leaves the sum of its per pixel error behind. A child only
+re-renders the bounding box of the triangles that differ from its parent and
+swaps the error of that box in the parent's sum, so its cost follows the
+mutated area instead of the image size. The full error map of a child is
+only built, from its parent's map and its box, once the next generation is
+bred from it.
+
+The target and the error maps and sums of the last two generations live in
+shared memory, the pool workers map them once and every generation only the
+chromosones are sent.
+"""
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from rasterizer import Rasterizer, triangle_coefficients
+
+NUM_CHANNELS = 4
+
+# FitnessState of this worker process, set by _init_worker
+_worker_state = None
+
+
+def split_target(target_phenotype):
+    """(3, height, width) float32 rgb planes of the target and the summed
+    fitness of its alpha channel, rendered chromosones are opaque
+    """
+    target_rgb = np.ascontiguousarray(
+        target_phenotype[:, :, :3].transpose(2, 0, 1), dtype=np.float32)
+    alpha_fitness = np.sum(1.0 - np.abs(target_phenotype[:, :, 3] - 1.0))
+    return target_rgb, alpha_fitness
+
+
+def calculate_fitness(chromosone, total_triangles, size, target, rasterizer):
+    """mean per channel similarity in 0 to 1 of the rendered chromosone and
+    the target, target is the result of split_target
+    """
+    width, height = size
+    target_rgb, alpha_fitness = target
+    buffer = rasterizer.render(chromosone, total_triangles)
+    diff = np.abs(target_rgb - buffer)
+    fitness = diff.size - np.sum(diff, dtype=np.float64) + alpha_fitness
+    return fitness / (width * height * NUM_CHANNELS)
+
+
+def changed_triangles(chromosone, parent, total_triangles):
+    """bool mask of the triangles that differ between the two chromosones
+    """
+    difference = chromosone.reshape(total_triangles, -1) != parent.reshape(
+        total_triangles, -1)
+    return np.any(difference, axis=1)
+
+
+def dirty_box(chromosone, parent, total_triangles, size):
+    """x0 y0 x1 y1 box around the old and new pixels of the triangles that
+    differ from the parent, None when the rendering did not change
+    """
+    changed = changed_triangles(chromosone, parent, total_triangles)
+    if not changed.any():
+        return None
+    boxes = np.concatenate((
+        triangle_coefficients(chromosone, total_triangles, size)[0][changed],
+        triangle_coefficients(parent, total_triangles, size)[0][changed]))
+    boxes = boxes[(boxes[:, 0] < boxes[:, 2]) & (boxes[:, 1] < boxes[:, 3])]
+    if not len(boxes):
+        return None
+    return (boxes[:, 0].min(), boxes[:, 1].min(),
+            boxes[:, 2].max(), boxes[:, 3].max())
+
+
+def split_chunks(total, chunks):
+    """(start, end) of at most chunks near equal slices of range(total)
+    """
+    bounds = np.linspace(0, total, min(chunks, total) + 1).astype(int)
+    return list(zip(bounds[:-1], bounds[1:]))
+
+
+class FitnessState(object):
+    """target, rasterizer and error maps of one evaluating process
+
+    error_maps is a (2, population, 3, height, width) float32 array and
+    error_sums a (2, population) float64 array of their sums, the
+    generations alternate between the two slots
+    """
+
+    def __init__(self, target_rgb, alpha_fitness, error_maps, error_sums,
+                 size):
+        self.target_rgb = target_rgb
+        self.alpha_fitness = alpha_fitness
+        self.error_maps = error_maps
+        self.error_sums = error_sums
+        self.size = size
+        self.rasterizer = Rasterizer(size)
+
+    def box_error(self, chromosone, total_triangles, box, out):
+        """error of the chromosone inside the x0 y0 x1 y1 box written to out
+        """
+        x0, y0, x1, y1 = box
+        buffer = self.rasterizer.render(chromosone, total_triangles, clip=box)
+        np.subtract(self.target_rgb[:, y0:y1, x0:x1],
+                    buffer[:, y0:y1, x0:x1], out=out)
+        np.abs(out, out=out)
+        return out
+
+    def evaluate(self, index, chromosone, parent, parent_index,
+                 total_triangles, slot):
+        """fitness of the chromosone at index of the generation in slot
+
+        parent is None or a chromosone of the previous generation whose
+        error map and sum are at parent_index of the other slot. A child
+        only writes the box of its changed triangles to its error map,
+        build_error_map copies the rest from the parent.
+        """
+        if parent is None:
+            error_map = self.error_maps[slot, index]
+            width, height = self.size
+            self.box_error(chromosone, total_triangles,
+                           (0, 0, width, height), error_map)
+            error_sum = np.sum(error_map, dtype=np.float64)
+        else:
+            error_sum = self.error_sums[1 - slot, parent_index]
+            box = dirty_box(chromosone, parent, total_triangles, self.size)
+            if box is not None:
+                x0, y0, x1, y1 = box
+                parent_map = self.error_maps[1 - slot, parent_index]
+                region = self.error_maps[slot, index][:, y0:y1, x0:x1]
+                self.box_error(chromosone, total_triangles, box, region)
+                error_sum = (error_sum -
+                             np.sum(parent_map[:, y0:y1, x0:x1],
+                                    dtype=np.float64) +
+                             np.sum(region, dtype=np.float64))
+        self.error_sums[slot, index] = error_sum
+
+        width, height = self.size
+        fitness = (self.target_rgb.size - error_sum + self.alpha_fitness)
+        return fitness / (width * height * NUM_CHANNELS)
+
+    def build_error_map(self, index, chromosone, parent, parent_index,
+                        total_triangles, slot):
+        """completes the error map of a child evaluated with a parent in
+        slot with the pixels of its parent's map outside the box evaluate
+        wrote
+        """
+        error_map = self.error_maps[slot, index]
+        parent_map = self.error_maps[1 - slot, parent_index]
+        box = dirty_box(chromosone, parent, total_triangles, self.size)
+        if box is None:
+            error_map[...] = parent_map
+            return
+        x0, y0, x1, y1 = box
+        error_map[:, :y0] = parent_map[:, :y0]
+        error_map[:, y1:] = parent_map[:, y1:]
+        error_map[:, y0:y1, :x0] = parent_map[:, y0:y1, :x0]
+        error_map[:, y0:y1, x1:] = parent_map[:, y0:y1, x1:]
+
+    def evaluate_chunk(self, start, chromosones, parents, parent_indices,
+                       total_triangles, slot):
+        results = np.empty(len(chromosones))
+        for i, chromosone in enumerate(chromosones):
+            results[i] = self.evaluate(start + i, chromosone, parents[i],
+                                       parent_indices[i], total_triangles,
+                                       slot)
+        return results
+
+    def build_error_maps(self, indices, chromosones, parents, parent_indices,
+                         total_triangles, slot):
+        for i, index in enumerate(indices):
+            self.build_error_map(index, chromosones[i], parents[i],
+                                 parent_indices[i], total_triangles, slot)
+
+
+def _init_worker(shared_rgb, alpha_fitness, shared_maps, shared_sums,
+                 maps_shape, size):
+    global _worker_state
+    target_rgb = np.frombuffer(shared_rgb, dtype=np.float32).reshape(
+        maps_shape[2:])
+    error_maps = np.frombuffer(shared_maps, dtype=np.float32).reshape(
+        maps_shape)
+    error_sums = np.frombuffer(shared_sums, dtype=np.float64).reshape(
+        maps_shape[:2])
+    _worker_state = FitnessState(target_rgb, alpha_fitness, error_maps,
+                                 error_sums, size)
+
+
+def evaluate_chunk(*args):
+    """FitnessState.evaluate_chunk in a worker process
+    """
+    return _worker_state.evaluate_chunk(*args)
+
+
+def build_error_maps(*args):
+    """FitnessState.build_error_maps in a worker process
+    """
+    return _worker_state.build_error_maps(*args)
+
+
+class FitnessPool(object):
+    """evaluates successive generations, in process with one worker,
+    otherwise in chunks on a process pool
+
+    the chunks only depend on the population size and the worker count and
+    every chromosone has its own error map and sum, so the fitness values
+    are the same whatever worker finishes first
+    """
+
+    def __init__(self, target_phenotype, size, population_size, workers=None):
+        self.size = size
+        self.population_size = population_size
+        self.workers = workers or multiprocessing.cpu_count()
+        self.__generation = 0
+        self.__previous = None
+        # parents and parent indices the previous generation was scored with
+        self.__previous_parents = None
+
+        width, height = size
+        target_rgb, alpha_fitness = split_target(target_phenotype)
+        maps_shape = (2, population_size, 3, height, width)
+        if self.workers == 1:
+            self.__executor = None
+            self.__state = FitnessState(
+                target_rgb, alpha_fitness,
+                np.empty(maps_shape, dtype=np.float32),
+                np.empty(maps_shape[:2]), size)
+            return
+
+        self.__shared_rgb = multiprocessing.RawArray('f', target_rgb.size)
+        np.frombuffer(self.__shared_rgb, dtype=np.float32)[:] = \
+            target_rgb.ravel()
+        self.__shared_maps = multiprocessing.RawArray(
+            'f', int(np.prod(maps_shape)))
+        self.__shared_sums = multiprocessing.RawArray(
+            'd', int(np.prod(maps_shape[:2])))
+        self.__executor = ProcessPoolExecutor(
+            max_workers=self.workers, initializer=_init_worker,
+            initargs=(self.__shared_rgb, alpha_fitness, self.__shared_maps,
+                      self.__shared_sums, maps_shape, size))
+
+    def __parents(self, population, total_triangles, lineage):
+        """closest parent chromosone and its index for every chromosone
+        """
+        parents = [None] * len(population)
+        parent_indices = [0] * len(population)
+        if self.__previous is None or lineage is None:
+            return parents, parent_indices
+        for i, candidates in enumerate(lineage):
+            best_changes = total_triangles + 1
+            for candidate in candidates:
+                changes = np.count_nonzero(changed_triangles(
+                    population[i], self.__previous[candidate],
+                    total_triangles))
+                if changes < best_changes:
+                    best_changes = changes
+                    parents[i] = self.__previous[candidate]
+                    parent_indices[i] = candidate
+        return parents, parent_indices
+
+    def __build_error_maps(self, parents, parent_indices, total_triangles):
+        """error maps of the chromosones of the previous generation that
+        are parents of the current one and were scored from a parent
+        """
+        if self.__previous_parents is None:
+            return
+        grandparents, grandparent_indices = self.__previous_parents
+        indices = sorted(set(
+            index for parent, index in zip(parents, parent_indices)
+            if parent is not None and grandparents[index] is not None))
+        if not indices:
+            return
+        slot = (self.__generation - 1) % 2
+        args = (self.__previous[indices],
+                [grandparents[index] for index in indices],
+                [grandparent_indices[index] for index in indices])
+        if self.__executor is None:
+            self.__state.build_error_maps(indices, *args, total_triangles,
+                                          slot)
+            return
+        futures = []
+        for start, end in split_chunks(len(indices), self.workers):
+            futures.append(self.__executor.submit(
+                build_error_maps, indices[start:end],
+                *[arg[start:end] for arg in args], total_triangles, slot))
+        for future in futures:
+            future.result()
+
+    def evaluate(self, population, total_triangles, lineage=None):
+        """fitness array in the order of the population
+
+        lineage holds for every chromosone the indices of the chromosones of
+        the previously evaluated generation it was bred from, the one it
+        differs least from is used to score it incrementally
+        """
+        population = population[:self.population_size]
+        parents, parent_indices = self.__parents(population, total_triangles,
+                                                 lineage)
+        self.__build_error_maps(parents, parent_indices, total_triangles)
+        slot = self.__generation % 2
+        if self.__executor is None:
+            results = self.__state.evaluate_chunk(0, population, parents,
+                                                  parent_indices,
+                                                  total_triangles, slot)
+        else:
+            futures = []
+            for start, end in split_chunks(len(population), self.workers):
+                futures.append(self.__executor.submit(
+                    evaluate_chunk, start, population[start:end],
+                    parents[start:end], parent_indices[start:end],
+                    total_triangles, slot))
+            results = np.concatenate([future.result() for future in futures])
+
+        self.__previous = np.array(population)
+        self.__previous_parents = (parents, parent_indices)
+        self.__generation += 1
+        return results
+
+    def close(self):
+        if self.__executor is not None:
+            self.__executor.shutdown()
@@ -0,0 +1,136 @@
+"""Qt free triangle rasterizer for the EvoLisa fitness
+
+Alpha composites the triangles of a chromosone into a preallocated float32
+buffer with one plane per rgb channel, the same way the QPainter in
+evolisa.py draws them: a gray background, 8 bit colors and antialiased
+edges. Every triangle only touches the pixels of its bounding box.
+"""
+import numpy as np
+
+# values of a triangle in the chromosone: x0 y0 x1 y1 x2 y2 r g b a
+TRIANGLE_SIZE = 10
+# Qt.gray
+BACKGROUND = (160, 160, 164)
+
+
+def triangle_coefficients(chromosone, total_triangles, size):
+    """per triangle pixel bounding boxes and edge equations
+
+    returns the (n, 4) int x0, y0, x1, y1 boxes, (n, 3, 3) a, b, c of the
+    three edges, a * x + b * y + c is the signed distance in pixels to the
+    edge and positive inside the triangle, and the (n, 4) 8 bit quantized
+    rgba in 0 to 1. Degenerate triangles get an empty box.
+    """
+    width, height = size
+    data = np.asarray(chromosone, dtype=np.float64)
+    data = data[:total_triangles * TRIANGLE_SIZE].reshape(total_triangles,
+                                                          TRIANGLE_SIZE)
+    points = data[:, :6].reshape(-1, 3, 2) * (width, height)
+    colors = np.floor(data[:, 6:10] * 255.0) / 255.0
+
+    start = points
+    end = np.roll(points, -1, axis=1)
+    edge = end - start
+    # twice the signed area, flips the edges of clockwise triangles
+    area = (edge[:, 0, 0] * edge[:, 1, 1]) - (edge[:, 0, 1] * edge[:, 1, 0])
+    lengths = np.sqrt((edge * edge).sum(axis=-1))
+    degenerate = (np.abs(area) < 1e-9) | np.any(lengths < 1e-9, axis=1)
+    lengths[lengths < 1e-9] = 1.0
+    sign = np.where(area < 0.0, -1.0, 1.0)[:, None] / lengths
+
+    coefficients = np.empty((total_triangles, 3, 3))
+    coefficients[:, :, 0] = -edge[:, :, 1] * sign
+    coefficients[:, :, 1] = edge[:, :, 0] * sign
+    coefficients[:, :, 2] = ((start[:, :, 0] * edge[:, :, 1]) -
+                             (start[:, :, 1] * edge[:, :, 0])) * sign
+
+    # antialiased edges bleed half a pixel outside the triangle
+    boxes = np.empty((total_triangles, 4), dtype=np.int64)
+    boxes[:, :2] = np.floor(points.min(axis=1) - 0.5)
+    boxes[:, 2:] = np.ceil(points.max(axis=1) + 0.5)
+    np.clip(boxes[:, 0::2], 0, width, out=boxes[:, 0::2])
+    np.clip(boxes[:, 1::2], 0, height, out=boxes[:, 1::2])
+    boxes[degenerate | (colors[:, 3] == 0.0)] = 0
+    return boxes, coefficients, colors
+
+
+class Rasterizer(object):
+    """renders chromosones into one reused (3, height, width) float32 buffer
+    in 0 to 1
+
+    channel planes keep the compositing on contiguous rows, image() gives
+    the usual (height, width, 3) view
+    """
+
+    def __init__(self, size, background=BACKGROUND):
+        self.size = size
+        width, height = size
+        self.background = (np.array(background, dtype=np.float32) /
+                           np.float32(255.0))[:, None, None]
+        self.buffer = np.empty((3, height, width), dtype=np.float32)
+        # pixel centers
+        self.__xs = np.arange(width, dtype=np.float32) + 0.5
+        self.__ys = np.arange(height, dtype=np.float32) + 0.5
+        self.__coverage = np.empty(width * height, dtype=np.float32)
+        self.__distance = np.empty(width * height, dtype=np.float32)
+        self.__blend = np.empty(3 * width * height, dtype=np.float32)
+
+    def clear(self, box=None):
+        if box is None:
+            self.buffer[...] = self.background
+        else:
+            x0, y0, x1, y1 = box
+            self.buffer[:, y0:y1, x0:x1] = self.background
+
+    def image(self):
+        return self.buffer.transpose(1, 2, 0)
+
+    def draw_triangle(self, box, coefficients, color, clip=None):
+        """alpha composite one triangle, clip limits it to an x0 y0 x1 y1 box
+        """
+        x0, y0, x1, y1 = box
+        if clip is not None:
+            x0 = max(x0, clip[0])
+            y0 = max(y0, clip[1])
+            x1 = min(x1, clip[2])
+            y1 = min(y1, clip[3])
+        if x0 >= x1 or y0 >= y1:
+            return
+
+        shape = (y1 - y0, x1 - x0)
+        total = shape[0] * shape[1]
+        xs = self.__xs[x0:x1]
+        ys = self.__ys[y0:y1, None]
+        coverage = self.__coverage[:total].reshape(shape)
+        distance = self.__distance[:total].reshape(shape)
+
+        # distance to the nearest edge, coverage ramps over one pixel
+        a, b, c = coefficients[0]
+        np.add(xs * np.float32(a), ys * np.float32(b) + np.float32(c),
+               out=coverage)
+        for a, b, c in coefficients[1:]:
+            np.add(xs * np.float32(a), ys * np.float32(b) + np.float32(c),
+                   out=distance)
+            np.minimum(coverage, distance, out=coverage)
+        coverage += np.float32(0.5)
+        np.clip(coverage, 0.0, 1.0, out=coverage)
+        coverage *= np.float32(color[3])
+
+        region = self.buffer[:, y0:y1, x0:x1]
+        blend = self.__blend[:3 * total].reshape((3,) + shape)
+        np.subtract(color[:3, None, None].astype(np.float32), region,
+                    out=blend)
+        blend *= coverage
+        region += blend
+
+    def render(self, chromosone, total_triangles, clip=None):
+        """buffer planes with the chromosone drawn over the background
+
+        with a clip box only that part of the buffer is redrawn
+        """
+        boxes, coefficients, colors = triangle_coefficients(
+            chromosone, total_triangles, self.size)
+        self.clear(clip)
+        for i in range(total_triangles):
+            self.draw_triangle(boxes[i], coefficients[i], colors[i], clip)
+        return self.buffer
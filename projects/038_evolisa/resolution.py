@@ -0,0 +1,107 @@
+"""coarse to fine fitness resolutions for EvoLisa
+
+Early generations only place rough colors, so they are scored against a
+downsampled target. The schedule moves on to the next, finer level once the
+best fitness stops improving.
+"""
+import numpy as np
+
+# fractions of the full size, going up to the full size
+SCALES = (0.25, 0.5, 1.0)
+# generations the best fitness is compared over
+PLATEAU_GENERATIONS = 20
+# smallest best fitness gain over those generations that is no plateau
+PLATEAU_IMPROVEMENT = 0.0005
+
+
+def scaled_size(size, scale):
+    width, height = size
+    return (max(1, int(round(width * scale))),
+            max(1, int(round(height * scale))))
+
+
+def downsample(image, size):
+    """(height, width, channels) image area averaged to the width and
+    height of size, which do not have to divide the image size. Sizes above
+    the image size repeat the nearest pixel.
+    """
+    width, height = size
+    image_height, image_width = image.shape[:2]
+    rows = (np.arange(height) * image_height) // height
+    columns = (np.arange(width) * image_width) // width
+    summed = np.add.reduceat(np.add.reduceat(image, rows, axis=0), columns,
+                             axis=1)
+    # reduceat returns the single pixel at an index that does not advance
+    counts = (np.maximum(np.diff(np.append(rows, image_height)), 1)[:, None] *
+              np.maximum(np.diff(np.append(columns, image_width)), 1)[None, :])
+    return summed / counts[:, :, None]
+
+
+def target_pyramid(target_phenotype, size, scales=SCALES):
+    """[(size, target)] of every scale, targets keep the range and channels
+    of target_phenotype
+    """
+    pyramid = []
+    for scale in scales:
+        level_size = scaled_size(size, scale)
+        if level_size == tuple(size):
+            pyramid.append((level_size, target_phenotype))
+        else:
+            pyramid.append((level_size, downsample(target_phenotype,
+                                                   level_size)))
+    return pyramid
+
+
+class ResolutionSchedule(object):
+    """picks the pyramid level the population is scored at
+
+    a level is left for the next one when the best fitness gained less than
+    plateau_improvement over the last plateau_generations generations, or
+    after max_generations when that is set. scales have to go up and end
+    at 1.0, the full size.
+    """
+
+    def __init__(self, scales=SCALES, plateau_generations=PLATEAU_GENERATIONS,
+                 plateau_improvement=PLATEAU_IMPROVEMENT,
+                 max_generations=None, level=0):
+        self.scales = tuple(scales)
+        if (not self.scales or self.scales[0] <= 0.0 or
+                self.scales[-1] != 1.0 or
+                any(a >= b for a, b in zip(self.scales, self.scales[1:]))):
+            raise ValueError('scales {} do not go up to 1.0'.format(
+                ','.join(str(scale) for scale in self.scales)))
+        self.plateau_generations = plateau_generations
+        self.plateau_improvement = plateau_improvement
+        self.max_generations = max_generations
+        self.level = level
+        # best fitness of every generation at the level, its length is the
+        # generations spent at the level
+        self.history = []
+
+    @property
+    def scale(self):
+        return self.scales[self.level]
+
+    @property
+    def is_final(self):
+        return self.level == len(self.scales) - 1
+
+    def update(self, best_fitness):
+        """record the best fitness of a generation, returns True when the
+        next generation moves to the next level
+        """
+        if self.is_final:
+            return False
+        self.history.append(best_fitness)
+        generations = len(self.history)
+        plateau = False
+        if generations > self.plateau_generations:
+            gain = (self.history[-1] -
+                    self.history[-1 - self.plateau_generations])
+            plateau = gain < self.plateau_improvement
+        if plateau or (self.max_generations is not None and
+                       generations >= self.max_generations):
+            self.level += 1
+            self.history = []
+            return True
+        return False
@@ -0,0 +1,386 @@
+"""Qt free boids model
+
+Every boid is a Boid object. tick_environment steers all boids from the last
+tick, or moves them one after the other with synchronous off. run_boids.py
+draws an environment and flock.py is the numpy version.
+"""
+import math
+import random
+
+
+TOTAL_BOIDS = 150
+DEFAULT_MAX_SPEED = 9.0
+DEFAULT_MAX_DISTANCE = 60.0
+DEFAULT_EYE_SIGHT_ANGLE = 120.0
+SEPARATION_DISTANCE = 20.0
+PUSH_BACK_SPEED = 0.5
+COHESION_STRENGTH = 0.01
+SEPRATION_STRENGTH = 0.1
+SEPARATION_VALUE = 1.0
+COHESION_VALUE = 1.0
+ALIGNMENT_VALUE = 1.0
+DEBUG = False
+
+
+class Rect:
+    def __init__(self, x=0.0, y=0.0, width=0.0, height=0.0):
+        self.x = x
+        self.y = y
+        self.width = width
+        self.height = height
+
+
+class Vec2(object):
+    def __init__(self, x=0.0, y=0.0):
+        self.x = x
+        self.y = y
+
+    def __repr__(self):
+        return 'Vec2(x={!r}, y={!r})'.format(self.x, self.y)
+
+
+class BoidsEnvironment:
+    def __init__(self):
+        self.is_running = True
+        self.rect = Rect()
+        self.max_speed = DEFAULT_MAX_SPEED
+        self.boids = []
+        self.neighbour_max_distance = DEFAULT_MAX_DISTANCE
+        self.neighbour_max_distance2 = DEFAULT_MAX_DISTANCE * DEFAULT_MAX_DISTANCE
+        # look neighbours up in a SpatialGrid, False scans every boid and is
+        # kept as the reference the grid has to match
+        self.use_grid = True
+        # steer every boid from the positions and velocities of the last
+        # tick, False moves the boids one after the other in list order
+        self.synchronous = True
+        # boids get_neighbours compared distances with since the last tick
+        self.neighbour_checks = 0
+
+
+class Boid:
+    def __init__(self):
+        self.pos = Vec2()
+        self.velocity = Vec2(0.0, 0.0)
+        # self.steering = random.random() * 0.1
+
+        self.debug = False
+        self.eyesight = math.radians(DEFAULT_EYE_SIGHT_ANGLE)
+
+        self.steering = 0.05
+        self.separation_distance = SEPARATION_DISTANCE
+        self.separation_distance2 = SEPARATION_DISTANCE * SEPARATION_DISTANCE
+
+        self.separation = 1.0
+        self.alignment = 1.0
+        self.cohesion = 1.0
+
+
+def add_vec2(vec1, vec2):
+    return Vec2(x=vec1.x + vec2.x, y=vec1.y + vec2.y)
+
+
+def sub_vec2(vec1, vec2):
+    return Vec2(x=vec1.x - vec2.x, y=vec1.y - vec2.y)
+
+
+def substract_vec2(vec1, vec2):
+    vec1.x -= vec2.x
+    vec1.y -= vec2.y
+
+
+def mul_vec2(vec, value):
+    return Vec2(x=vec.x * value, y=vec.y * value)
+
+
+def len_vec(vec):
+    return math.sqrt(vec.x * vec.x + vec.y * vec.y)
+
+
+def len2_vec(vec):
+    return vec.x * vec.x + vec.y * vec.y
+
+
+def div_vec(vec, value):
+    return Vec2(x=vec.x / value, y=vec.y / value)
+
+
+def normalized_vec(vec):
+    length = len_vec(vec)
+    return Vec2(vec.x / length, vec.y / length)
+
+
+def dot_vec(vec1, vec2):
+    return vec1.x * vec2.x + vec1.y * vec2.y
+
+
+class SpatialGrid(object):
+    """uniform grid of square cells that maps a cell to the indices of the
+    boids in it
+
+    cells are a bit larger than the neighbour distance, so every neighbour of
+    a boid is in the 3x3 cells around the cell of the boid
+    """
+
+    def __init__(self, max_distance):
+        self.cell_size = max(max_distance, 1e-6) * (1.0 + 1e-6)
+        self.cells = {}
+        self.boid_cells = []
+
+    def cell(self, pos):
+        return int(math.floor(pos.x / self.cell_size)), int(math.floor(pos.y / self.cell_size))
+
+    def rebuild(self, boids):
+        self.cells = {}
+        self.boid_cells = []
+        for index, boid in enumerate(boids):
+            cell = self.cell(boid.pos)
+            self.cells.setdefault(cell, []).append(index)
+            self.boid_cells.append(cell)
+
+    def move(self, index, boid):
+        """update the cell of the boid at index after its position changed
+        """
+        cell = self.cell(boid.pos)
+        old_cell = self.boid_cells[index]
+        if cell == old_cell:
+            return
+        indices = self.cells[old_cell]
+        indices.remove(index)
+        if not indices:
+            del self.cells[old_cell]
+        self.cells.setdefault(cell, []).append(index)
+        self.boid_cells[index] = cell
+
+    def candidates(self, pos):
+        """indices of the boids in the cells around pos in list order, so
+        neighbours are summed in the same order as a scan of every boid
+        """
+        cx, cy = self.cell(pos)
+        indices = []
+        for x in (cx - 1, cx, cx + 1):
+            for y in (cy - 1, cy, cy + 1):
+                indices.extend(self.cells.get((x, y), ()))
+        indices.sort()
+        return indices
+
+
+def _make_grid(environment):
+    if not environment.use_grid:
+        return None
+    grid = SpatialGrid(environment.neighbour_max_distance)
+    grid.rebuild(environment.boids)
+    return grid
+
+
+def get_neighbours(environment, boid, angle=True, grid=None):
+    neighbours = []
+    angle_neighbours = []
+    dist_vec = Vec2()
+
+    if grid is None:
+        candidates = environment.boids
+    else:
+        boids = environment.boids
+        candidates = [boids[i] for i in grid.candidates(boid.pos)]
+    environment.neighbour_checks += len(candidates) - 1
+
+    for boid_i in candidates:
+        if boid_i == boid:
+            continue
+        dist_vec.x = boid_i.pos.x
+        dist_vec.y = boid_i.pos.y
+        substract_vec2(dist_vec, boid.pos)
+
+        # distance = len_vec(dist_vec)
+        dist_dist = dist_vec.x * dist_vec.x + dist_vec.y * dist_vec.y
+
+        if dist_dist == 0.0:
+            neighbours.append(boid_i)
+        elif dist_dist <= environment.neighbour_max_distance2:
+            dist_normalised = normalized_vec(dist_vec)
+            dot = dot_vec(boid.velocity, dist_normalised)
+            neighbours.append(boid_i)
+
+            if angle:
+                # radians = math.acos(dot)
+                # radians = math.atan2(dist_normalised.y, dist_normalised.x)
+                if dot > 1.0:
+                    dot = 1.0
+                if dot < -1.0:
+                    dot = 1.0
+
+                current_angle = math.acos(dot)
+
+                if abs(current_angle) > boid.eyesight:
+                    continue
+
+                angle_neighbours.append(boid_i)
+
+    return neighbours, angle_neighbours
+
+
+def _calc_separation_vec(boid, neighbours):
+    separation_vec = Vec2()
+    if neighbours:
+        for neighbour in neighbours:
+            diff = sub_vec2(neighbour.pos, boid.pos)
+            if len2_vec(diff) < boid.separation_distance2:
+                separation_vec = sub_vec2(separation_vec, diff)
+        separation_vec = mul_vec2(separation_vec, SEPRATION_STRENGTH)
+    return separation_vec
+
+
+def _calc_alignment_vec(boid, neighbours):
+    average_direction = Vec2()
+    if neighbours:
+        for neighbour in neighbours:
+            average_direction = add_vec2(average_direction, neighbour.velocity)
+
+        average_direction = div_vec(average_direction, len(neighbours))
+        average_direction = div_vec(sub_vec2(average_direction, boid.velocity), 8.0)
+    # alignment_vec = average_direction
+    # alignment_vec = normalized_vec(alignment_vec)
+    return average_direction
+
+
+def _calc_cohesion(boid, neighbours):
+    average_pos = Vec2()
+    if neighbours:
+        for neighbour in neighbours:
+            average_pos = add_vec2(average_pos, neighbour.pos)
+
+        average_pos = div_vec(average_pos, len(neighbours))
+        average_pos = sub_vec2(average_pos, boid.pos)
+        average_pos = mul_vec2(average_pos, COHESION_STRENGTH)
+    return average_pos
+
+
+def _limit_velocity(env, velocity):
+    if len_vec(velocity) > env.max_speed:
+        return mul_vec2(normalized_vec(velocity), env.max_speed)
+    return Vec2(velocity.x, velocity.y)
+
+
+def _next_velocity(environment, boid, grid=None):
+    all_neighbours, neighbours = get_neighbours(environment, boid, grid=grid)
+
+    # separation
+    separation_vec = _calc_separation_vec(boid, all_neighbours)
+    separation_vec = mul_vec2(separation_vec, boid.separation)
+
+    # alignment
+    alignment_vec = _calc_alignment_vec(boid, neighbours)
+    alignment_vec = mul_vec2(alignment_vec, boid.alignment)
+
+    cohesion_vec = _calc_cohesion(boid, neighbours)
+    cohesion_vec = mul_vec2(cohesion_vec, boid.cohesion)
+
+    velocity = boid.velocity
+    velocity = add_vec2(velocity, separation_vec)
+    velocity = add_vec2(velocity, alignment_vec)
+    velocity = add_vec2(velocity, cohesion_vec)
+    velocity = add_vec2(velocity, _bound_position(environment, boid))
+    return _limit_velocity(environment, velocity)
+
+
+def tick_boid(environment, boid, grid=None):
+    velocity = _next_velocity(environment, boid, grid=grid)
+    boid.velocity = velocity
+
+    boid.pos = add_vec2(boid.pos, velocity)
+
+    # bound_v = _bound_position(environment, boid)
+    # boid.velocity = bound_v
+
+
+def _bound_position(env, boid):
+    rect = env.rect
+    xmin, xmax, ymin, ymax = rect.x, rect.x + rect.width, rect.y, rect.y + rect.height
+    vec = Vec2()
+    if boid.pos.x < xmin:
+        vec.x = PUSH_BACK_SPEED
+    elif boid.pos.x > xmax:
+        vec.x = -PUSH_BACK_SPEED
+
+    if boid.pos.y < ymin:
+        vec.y = PUSH_BACK_SPEED
+    elif boid.pos.y > ymax:
+        vec.y = -PUSH_BACK_SPEED
+
+    return vec
+
+
+def tick_move_boids(environment, boid):
+    pass
+    # move
+    # new_pos = add_vec2(boid.pos, boid.velocity)
+    # bound_v = _bound_position(environment, boid)
+    # boid.velocity = bound_v
+
+    # new_pos.x = new_pos.x % environment.width
+    # new_pos.y = new_pos.y % environment.height
+    # boid.pos = new_pos
+
+
+def tick_environment(environment):
+    if not environment.is_running:
+        return
+    environment.neighbour_checks = 0
+    grid = _make_grid(environment)
+    if environment.synchronous:
+        # the new velocities are the next frame, no boid moves before all
+        # of them have steered
+        velocities = [_next_velocity(environment, boid, grid=grid) for boid in environment.boids]
+        for boid, velocity in zip(environment.boids, velocities):
+            boid.velocity = velocity
+            boid.pos = add_vec2(boid.pos, velocity)
+        return
+
+    # boids move one after the other, the grid follows every move so later
+    # boids see the same positions as with a scan of every boid
+    for index, boid in enumerate(environment.boids):
+        tick_boid(environment, boid, grid=grid)
+        if grid is not None:
+            grid.move(index, boid)
+
+
+def _make_boid(rect, speed):
+    xmin, xmax, ymin, ymax = rect.x, rect.x + rect.width, rect.y, rect.y + rect.height
+    boid = Boid()
+    boid.pos.x = float(random.randint(xmin, xmax))
+    boid.pos.y = float(random.randint(ymin, ymax))
+
+    dir = Vec2((random.random() * 2.0) - 1.0, (random.random() * 2.0) - 1.0)
+    boid.velocity = mul_vec2(normalized_vec(dir), speed)
+
+    # boid.velocity = 0.5
+    boid.debug = False
+    return boid
+
+
+def _make_environment(total, rect, max_speed, separation):
+    env = BoidsEnvironment()
+    env.rect = rect
+    for i in range(total):
+        boid = _make_boid(env.rect, max_speed)
+        boid.debug = False
+        boid.separation = separation
+
+        env.boids.append(boid)
+    if len(env.boids) > 1:
+        env.boids[0].debug = DEBUG
+        env.boids[0].pos = Vec2(env.rect.x + env.rect.width / 2.0, env.rect.y + env.rect.height / 2.0)
+    return env
+
+
+def _change_total(environment, new_total):
+    total = len(environment.boids)
+    if total == new_total:
+        return environment
+    elif total > new_total:
+        environment.boids = environment.boids[:new_total]
+    else:
+        diff = new_total - total
+        for i in range(diff):
+            environment.boids.append(
+                _make_boid(environment.rect, environment.max_speed))
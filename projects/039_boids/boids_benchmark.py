@@ -0,0 +1,133 @@
+"""time boids ticks without a display
+
+    python boids_benchmark.py --boids 100,1000,10000,50000 --radii 20,60
+
+    python boids_benchmark.py --model grid --boids 100,1000 --output grid.csv
+
+runs a seeded flock for a number of ticks for every boid count and
+neighbour radius and writes a csv row per run with the milliseconds and
+neighbour checks per tick and the memory of the boids and of a tick. The
+flock lives in a square that grows with the boid count so the boids per area
+stay those of run_boids.py, unless --width is given.
+"""
+import argparse
+import csv
+import math
+import random
+import sys
+import time
+import tracemalloc
+
+from boids import DEFAULT_MAX_SPEED, SEPARATION_VALUE, TOTAL_BOIDS, Rect, _make_environment, tick_environment
+from flock import MAX_CANDIDATES, Flock, FlockPool, tick_flock
+
+# square run_boids.py keeps TOTAL_BOIDS boids in
+DEFAULT_WIDTH = 500
+FIELDS = ('model', 'boids', 'radius', 'width', 'workers', 'ticks', 'ms_per_tick', 'neighbour_checks_per_tick',
+          'model_bytes', 'tick_peak_bytes')
+# flock is flock.py, grid and scan are the Boid objects of boids.py with
+# and without the SpatialGrid
+MODELS = ('flock', 'grid', 'scan')
+
+
+def parse_args(args=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--model', choices=MODELS, default='flock')
+    parser.add_argument('--boids', default='100,1000,10000,50000',
+                        help='comma separated boid counts')
+    parser.add_argument('--radii', default='20,60',
+                        help='comma separated neighbour distances')
+    parser.add_argument('--width', type=int, default=None,
+                        help='side of the square the boids start in, defaults to '
+                             'the boids per area of run_boids.py')
+    parser.add_argument('--ticks', type=int, default=10)
+    parser.add_argument('--warmup', type=int, default=1,
+                        help='untimed ticks before the timed ones')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='FlockPool processes of the flock model, memory '
+                             'of the worker processes is not measured')
+    parser.add_argument('--max-candidates', type=int, default=MAX_CANDIDATES)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help='csv path, defaults to stdout')
+    return parser.parse_args(args)
+
+
+def scaled_width(total):
+    return int(math.ceil(DEFAULT_WIDTH * math.sqrt(max(total, 1) / float(TOTAL_BOIDS))))
+
+
+def make_model(model, total, radius, width, seed):
+    rect = Rect(0, 0, width, width)
+    if model == 'flock':
+        environment = Flock(total, rect, DEFAULT_MAX_SPEED, SEPARATION_VALUE, seed=seed)
+    else:
+        random.seed(seed)
+        environment = _make_environment(total, rect, DEFAULT_MAX_SPEED, SEPARATION_VALUE)
+        environment.use_grid = model == 'grid'
+    environment.neighbour_max_distance = radius
+    environment.neighbour_max_distance2 = radius * radius
+    return environment
+
+
+def run(model, total, radius, width, args, pool=None):
+    """FIELDS of one seeded run
+    """
+    if model == 'flock':
+        def tick(environment):
+            tick_flock(environment, max_candidates=args.max_candidates, pool=pool)
+    else:
+        tick = tick_environment
+
+    tracemalloc.start()
+    environment = make_model(model, total, radius, width, args.seed)
+    model_bytes = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    for _ in range(args.warmup):
+        tick(environment)
+    checks = 0
+    seconds = 0.0
+    for _ in range(args.ticks):
+        start = time.perf_counter()
+        tick(environment)
+        seconds += time.perf_counter() - start
+        checks += environment.neighbour_checks
+
+    # one more tick to measure its memory, tracing slows the timed ones down
+    tracemalloc.start()
+    tick(environment)
+    tick_peak_bytes = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    ticks = max(args.ticks, 1)
+    return (model, total, radius, width, args.workers if model == 'flock' else 1, args.ticks,
+            '{:.3f}'.format(seconds * 1000.0 / ticks), checks // ticks, model_bytes, tick_peak_bytes)
+
+
+def main(args=None):
+    args = parse_args(args)
+    totals = [int(total) for total in args.boids.split(',')]
+    radii = [float(radius) for radius in args.radii.split(',')]
+
+    output = open(args.output, 'w', newline='') if args.output else sys.stdout
+    pool = FlockPool(args.workers) if args.model == 'flock' and args.workers != 1 else None
+    # the first model also allocates the lazy caches of numpy and random,
+    # which would count as model memory of the first run
+    make_model(args.model, 2, 1.0, 1, args.seed)
+    try:
+        writer = csv.writer(output)
+        writer.writerow(FIELDS)
+        for total in totals:
+            width = args.width or scaled_width(total)
+            for radius in radii:
+                writer.writerow(run(args.model, total, radius, width, args, pool=pool))
+                output.flush()
+    finally:
+        if pool is not None:
+            pool.close()
+        if output is not sys.stdout:
+            output.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,413 @@
+"""numpy boids
+
+A Flock keeps the positions and velocities of all boids in a double buffer
+and the per boid parameters in a matrix. tick_flock steers every boid at once
+from the neighbour pairs of a CellGrid, reading frame t and writing frame
+t + 1, so boid ranges can be stepped independently, in process or by the
+worker processes of a FlockPool. The rules are the ones of boids.py and a
+synchronous BoidsEnvironment tick gives the same flock up to float rounding.
+"""
+import math
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from boids import (DEFAULT_MAX_SPEED, DEFAULT_MAX_DISTANCE, DEFAULT_EYE_SIGHT_ANGLE, SEPARATION_DISTANCE,
+                   PUSH_BACK_SPEED, COHESION_STRENGTH, SEPRATION_STRENGTH, DEBUG, Rect, Vec2)
+
+# neighbour candidates looked at in one batch, bounds the memory of a tick
+MAX_CANDIDATES = 1 << 21
+# columns of Flock.parameters
+PARAMETERS = ('separation', 'alignment', 'cohesion', 'eyesight', 'separation_distance')
+# boid ranges a FlockPool hands every worker per tick
+RANGES_PER_WORKER = 4
+
+# shared state of this worker process, set by _init_worker
+_worker_state = None
+# (tick, n, CellGrid) of the last tick this worker stepped
+_worker_grid = None
+
+
+def split_ranges(total, chunks):
+    """(start, stop) of at most chunks near equal slices of range(total)
+    """
+    bounds = np.linspace(0, total, min(chunks, total) + 1).astype(int)
+    return list(zip(bounds[:-1], bounds[1:]))
+
+
+class CellGrid(object):
+    """boids sorted by square cells a bit larger than the neighbour distance,
+    so every neighbour of a boid is in the 3x3 cells around its cell
+    """
+
+    def __init__(self, positions, max_distance):
+        self.cell_size = max(max_distance, 1e-6) * (1.0 + 1e-6)
+        cells = np.floor(positions / self.cell_size).astype(np.int64)
+        # one empty row and column around the occupied cells, so the keys of
+        # the cells around a boid never wrap into another column
+        cells -= cells.min(axis=0) - 1
+        rows = int(cells[:, 1].max()) + 2
+        self.keys = cells[:, 0] * rows + cells[:, 1]
+        self.order = np.argsort(self.keys, kind='stable')
+        cell_keys, cell_starts, cell_counts = np.unique(self.keys[self.order], return_index=True,
+                                                        return_counts=True)
+
+        # for every boid the start in order and the boid count of its 9 cells
+        offsets = np.array([x * rows + y for x in (-1, 0, 1) for y in (-1, 0, 1)], dtype=np.int64)
+        around = self.keys[:, None] + offsets[None, :]
+        found = np.minimum(np.searchsorted(cell_keys, around), len(cell_keys) - 1)
+        self.starts = cell_starts[found]
+        self.counts = np.where(cell_keys[found] == around, cell_counts[found], 0)
+
+    def ranges(self, max_candidates=MAX_CANDIDATES, start=0, stop=None):
+        """(start, stop) ranges of the boids start to stop with about
+        max_candidates candidates each
+        """
+        stop = len(self.keys) if stop is None else stop
+        candidates = np.cumsum(self.counts[start:stop].sum(axis=1))
+        if stop <= start or candidates[-1] <= max_candidates:
+            return [(start, stop)]
+        splits = np.searchsorted(candidates, np.arange(max_candidates, candidates[-1], max_candidates), side='right')
+        bounds = np.unique(np.concatenate(([0], splits, [stop - start]))) + start
+        return list(zip(bounds[:-1], bounds[1:]))
+
+    def candidates(self, start, stop):
+        """boid index arrays i and j of every other boid j in the cells around
+        a boid i of start to stop
+        """
+        counts = self.counts[start:stop].ravel()
+        starts = self.starts[start:stop].ravel()
+        total = int(counts.sum())
+        i = np.repeat(np.repeat(np.arange(start, stop), 9), counts)
+        first = np.cumsum(counts) - counts
+        j = self.order[np.repeat(starts - first, counts) + np.arange(total)]
+        others = i != j
+        return i[others], j[others]
+
+
+def _vec_property(name):
+    def get(self):
+        x, y = getattr(self.flock, name)[self.index]
+        return Vec2(float(x), float(y))
+
+    def set(self, vec):
+        getattr(self.flock, name)[self.index] = vec.x, vec.y
+    return property(get, set)
+
+
+def _value_property(name, cast=float):
+    def get(self):
+        return cast(getattr(self.flock, name)[self.index])
+
+    def set(self, value):
+        getattr(self.flock, name)[self.index] = value
+    return property(get, set)
+
+
+class BoidView(object):
+    """a boid of a Flock with the attributes of a Boid, so a flock can be
+    drawn and edited like a BoidsEnvironment
+    """
+    pos = _vec_property('positions')
+    velocity = _vec_property('velocities')
+    debug = _value_property('debug', bool)
+    eyesight = _value_property('eyesight')
+    separation = _value_property('separation')
+    alignment = _value_property('alignment')
+    cohesion = _value_property('cohesion')
+    separation_distance = _value_property('separation_distance')
+
+    def __init__(self, flock, index):
+        self.flock = flock
+        self.index = index
+
+    @property
+    def separation_distance2(self):
+        return self.separation_distance * self.separation_distance
+
+
+def _state_property(columns):
+    def get(self):
+        return self.state[self.frame, :, columns]
+
+    def set(self, value):
+        self.state[self.frame, :, columns] = value
+    return property(get, set)
+
+
+def _parameter_property(column):
+    def get(self):
+        return self.parameters[:, column]
+
+    def set(self, value):
+        self.parameters[:, column] = value
+    return property(get, set)
+
+
+class Flock(object):
+    """BoidsEnvironment with the boids stored as arrays
+
+    state is a (2, boids, 4) array of x, y, velocity x and velocity y, frame
+    is the current one and a tick writes the other. positions, velocities
+    and the PARAMETERS are views of the current frame and of parameters.
+    """
+    positions = _state_property(slice(0, 2))
+    velocities = _state_property(slice(2, 4))
+    separation = _parameter_property(0)
+    alignment = _parameter_property(1)
+    cohesion = _parameter_property(2)
+    eyesight = _parameter_property(3)
+    separation_distance = _parameter_property(4)
+
+    def __init__(self, total=0, rect=None, max_speed=DEFAULT_MAX_SPEED, separation=1.0, seed=None):
+        self.is_running = True
+        self.rect = rect or Rect()
+        self.max_speed = max_speed
+        self.neighbour_max_distance = DEFAULT_MAX_DISTANCE
+        self.neighbour_max_distance2 = DEFAULT_MAX_DISTANCE * DEFAULT_MAX_DISTANCE
+        self.rng = np.random.default_rng(seed)
+
+        self.state = np.zeros((2, 0, 4))
+        self.frame = 0
+        self.parameters = np.zeros((0, len(PARAMETERS)))
+        self.debug = np.zeros(0, dtype=bool)
+        # neighbour candidates checked by the last tick
+        self.neighbour_checks = 0
+        self.__views = []
+        self.resize(total, separation=separation)
+        if total > 1:
+            self.debug[0] = DEBUG
+            self.positions[0] = self.rect.x + self.rect.width / 2.0, self.rect.y + self.rect.height / 2.0
+
+    @classmethod
+    def from_environment(cls, environment):
+        """a Flock with the boids of a BoidsEnvironment
+        """
+        flock = cls(rect=environment.rect, max_speed=environment.max_speed)
+        flock.is_running = environment.is_running
+        flock.neighbour_max_distance = environment.neighbour_max_distance
+        flock.neighbour_max_distance2 = environment.neighbour_max_distance2
+        boids = environment.boids
+        flock.state = np.zeros((2, len(boids), 4))
+        flock.state[0] = [(boid.pos.x, boid.pos.y, boid.velocity.x, boid.velocity.y) for boid in boids]
+        flock.parameters = np.array([[getattr(boid, name) for name in PARAMETERS] for boid in boids],
+                                    dtype=float).reshape(-1, len(PARAMETERS))
+        flock.debug = np.array([boid.debug for boid in boids], dtype=bool)
+        return flock
+
+    def __len__(self):
+        return self.state.shape[1]
+
+    @property
+    def boids(self):
+        """a BoidView per boid, the same views until the flock is resized
+        """
+        if len(self.__views) != len(self):
+            self.__views = [BoidView(self, i) for i in range(len(self))]
+        return self.__views
+
+    @property
+    def bounds(self):
+        rect = self.rect
+        return rect.x, rect.y, rect.x + rect.width, rect.y + rect.height
+
+    def resize(self, total, separation=None):
+        """drop the last boids or add random ones, like _change_total
+        """
+        current = len(self)
+        if total <= current:
+            self.state = self.state[:, :total]
+            self.parameters = self.parameters[:total]
+            self.debug = self.debug[:total]
+            return
+        added = total - current
+        rect = self.rect
+        state = np.zeros((2, added, 4))
+        # random integer positions like _make_boid
+        state[self.frame, :, 0] = self.rng.integers(int(rect.x), int(rect.x + rect.width), added, endpoint=True)
+        state[self.frame, :, 1] = self.rng.integers(int(rect.y), int(rect.y + rect.height), added, endpoint=True)
+        directions = self.rng.random((added, 2)) * 2.0 - 1.0
+        directions /= np.linalg.norm(directions, axis=1)[:, None]
+        state[self.frame, :, 2:] = directions * self.max_speed
+
+        if separation is None:
+            separation = self.separation[-1] if current else 1.0
+        parameters = np.empty((added, len(PARAMETERS)))
+        parameters[:] = separation, 1.0, 1.0, math.radians(DEFAULT_EYE_SIGHT_ANGLE), SEPARATION_DISTANCE
+        self.state = np.concatenate((self.state, state), axis=1)
+        self.parameters = np.concatenate((self.parameters, parameters))
+        self.debug = np.concatenate((self.debug, np.zeros(added, dtype=bool)))
+
+
+def _steering(current, parameters, grid, start, stop, max_distance2):
+    """separation, alignment and cohesion velocity of the boids start to stop
+    """
+    positions, velocities = current[:, :2], current[:, 2:]
+    separation_values, alignment_values, cohesion_values, eyesight, separation_distance = parameters.T
+    total = stop - start
+    i, j = grid.candidates(start, stop)
+    diff = positions[j] - positions[i]
+    dist2 = np.einsum('ij,ij->i', diff, diff)
+    near = dist2 <= max_distance2
+    i, j, diff, dist2 = i[near], j[near], diff[near], dist2[near]
+    local = i - start
+
+    # separation from all neighbours
+    close = dist2 < separation_distance[i] ** 2
+    separation = -np.column_stack((np.bincount(local[close], diff[close, 0], total),
+                                   np.bincount(local[close], diff[close, 1], total)))
+    separation = separation * SEPRATION_STRENGTH * separation_values[start:stop, None]
+
+    # alignment and cohesion only with the neighbours in the eyesight, the
+    # dot clamp of get_neighbours also counts a dot below -1 as straight ahead
+    moved = dist2 > 0.0
+    i, j, local, diff = i[moved], j[moved], local[moved], diff[moved]
+    dot = np.einsum('ij,ij->i', velocities[i], diff) / np.sqrt(dist2[moved])
+    dot = np.where(dot < -1.0, 1.0, np.minimum(dot, 1.0))
+    seen = np.arccos(dot) <= eyesight[i]
+    local, j = local[seen], j[seen]
+
+    counts = np.bincount(local, minlength=total)
+    has_neighbours = (counts > 0)[:, None]
+    counts = np.maximum(counts, 1)[:, None]
+    velocity_sum = np.column_stack((np.bincount(local, velocities[j, 0], total),
+                                    np.bincount(local, velocities[j, 1], total)))
+    position_sum = np.column_stack((np.bincount(local, positions[j, 0], total),
+                                    np.bincount(local, positions[j, 1], total)))
+
+    alignment = (velocity_sum / counts - velocities[start:stop]) / 8.0
+    alignment = np.where(has_neighbours, alignment, 0.0) * alignment_values[start:stop, None]
+    cohesion = (position_sum / counts - positions[start:stop]) * COHESION_STRENGTH
+    cohesion = np.where(has_neighbours, cohesion, 0.0) * cohesion_values[start:stop, None]
+    return separation, alignment, cohesion
+
+
+def _bound_velocities(positions, bounds):
+    xmin, ymin, xmax, ymax = bounds
+    low = np.array((xmin, ymin))
+    high = np.array((xmax, ymax))
+    return np.where(positions < low, PUSH_BACK_SPEED, np.where(positions > high, -PUSH_BACK_SPEED, 0.0))
+
+
+def _limit_velocities(velocities, max_speed):
+    speed = np.linalg.norm(velocities, axis=1)
+    too_fast = speed > max_speed
+    velocities[too_fast] = velocities[too_fast] / speed[too_fast, None] * max_speed
+    return velocities
+
+
+def step_range(current, parameters, next_state, grid, start, stop, max_distance2, max_speed, bounds,
+               max_candidates=MAX_CANDIDATES):
+    """write the boids start to stop of the (boids, 4) frame current into
+    next_state, which must not be current
+
+    returns the neighbour candidates the boids were checked against
+    """
+    for range_start, range_stop in grid.ranges(max_candidates, start, stop):
+        separation, alignment, cohesion = _steering(current, parameters, grid, range_start, range_stop, max_distance2)
+        velocities = current[range_start:range_stop, 2:] + separation
+        velocities += alignment
+        velocities += cohesion
+        velocities += _bound_velocities(current[range_start:range_stop, :2], bounds)
+        velocities = _limit_velocities(velocities, max_speed)
+        next_state[range_start:range_stop, 2:] = velocities
+        next_state[range_start:range_stop, :2] = current[range_start:range_stop, :2] + velocities
+    return int(grid.counts[start:stop].sum()) - (stop - start)
+
+
+def step_flock(flock, max_candidates=MAX_CANDIDATES):
+    """write the next frame of flock in process without switching to it
+    """
+    current = flock.state[flock.frame]
+    grid = CellGrid(current[:, :2], flock.neighbour_max_distance)
+    flock.neighbour_checks = step_range(current, flock.parameters, flock.state[1 - flock.frame], grid, 0,
+                                        len(flock), flock.neighbour_max_distance2, flock.max_speed, flock.bounds,
+                                        max_candidates)
+
+
+def tick_flock(flock, max_candidates=MAX_CANDIDATES, pool=None):
+    """step every boid from the current frame into the other one and make
+    that the current frame, on the processes of pool when it is given
+    """
+    if not flock.is_running or not len(flock):
+        return
+    if pool is not None:
+        pool.step(flock, max_candidates)
+    else:
+        step_flock(flock, max_candidates)
+    flock.frame = 1 - flock.frame
+
+
+def _init_worker(shared_frames, shared_parameters, capacity):
+    global _worker_state
+    frames = np.frombuffer(shared_frames, dtype=np.float64).reshape((2, capacity, 4))
+    parameters = np.frombuffer(shared_parameters, dtype=np.float64).reshape((capacity, len(PARAMETERS)))
+    _worker_state = frames, parameters
+
+
+def step_worker_range(tick, total, start, stop, max_distance, max_distance2, max_speed, bounds, max_candidates):
+    """step_range of the shared frames in a worker process, the CellGrid is
+    built once per tick by every worker
+    """
+    global _worker_grid
+    frames, parameters = _worker_state
+    current = frames[0, :total]
+    if _worker_grid is None or _worker_grid[:2] != (tick, total):
+        _worker_grid = tick, total, CellGrid(current[:, :2], max_distance)
+    return step_range(current, parameters[:total], frames[1, :total], _worker_grid[2], start, stop, max_distance2,
+                      max_speed, bounds, max_candidates)
+
+
+class FlockPool(object):
+    """steps a Flock in ranges of boids on a process pool, in process with
+    one worker
+
+    every tick the current frame and the parameters are copied to shared
+    memory, the workers write their ranges of the next frame next to it.
+    The ranges only read frame t, so the flock is the same for any worker
+    count.
+    """
+
+    def __init__(self, workers=None):
+        self.workers = workers or multiprocessing.cpu_count()
+        self.__capacity = 0
+        self.__executor = None
+        self.__tick = 0
+
+    def __allocate(self, total):
+        self.close()
+        self.__capacity = max(total, 2 * self.__capacity)
+        self.__shared_frames = multiprocessing.RawArray('d', 2 * self.__capacity * 4)
+        self.__shared_parameters = multiprocessing.RawArray('d', self.__capacity * len(PARAMETERS))
+        self.__frames = np.frombuffer(self.__shared_frames, dtype=np.float64).reshape((2, self.__capacity, 4))
+        self.__parameters = np.frombuffer(self.__shared_parameters, dtype=np.float64).reshape(
+            (self.__capacity, len(PARAMETERS)))
+        self.__executor = ProcessPoolExecutor(
+            max_workers=self.workers, initializer=_init_worker,
+            initargs=(self.__shared_frames, self.__shared_parameters, self.__capacity))
+
+    def step(self, flock, max_candidates=MAX_CANDIDATES):
+        """write the next frame of flock without switching to it
+        """
+        total = len(flock)
+        if self.workers == 1:
+            step_flock(flock, max_candidates)
+            return
+        if self.__executor is None or total > self.__capacity:
+            self.__allocate(total)
+        self.__frames[0, :total] = flock.state[flock.frame]
+        self.__parameters[:total] = flock.parameters
+        self.__tick += 1
+        futures = []
+        for start, stop in split_ranges(total, self.workers * RANGES_PER_WORKER):
+            futures.append(self.__executor.submit(
+                step_worker_range, self.__tick, total, start, stop, flock.neighbour_max_distance,
+                flock.neighbour_max_distance2, flock.max_speed, flock.bounds, max_candidates))
+        flock.neighbour_checks = sum(future.result() for future in futures)
+        flock.state[1 - flock.frame] = self.__frames[1, :total]
+
+    def close(self):
+        if self.__executor is not None:
+            self.__executor.shutdown()
+            self.__executor = None
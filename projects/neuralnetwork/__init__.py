@@ -0,0 +1,6 @@
+"""fully connected networks shared by 029_ann, 030_runner and 031_snake_ann
+
+the projects put the projects directory on sys.path to import it, drawing
+needs PySide2 and is in neuralnetwork.painter
+"""
+from .network import Layer, Network, NetworkBatch, Neuron, sigmoid
@@ -0,0 +1,201 @@
+import copy
+import random
+
+import numpy as np
+
+
+def sigmoid(x):
+    """scaled to -1 to 1, 2 / (1 + e^-2x) - 1 is tanh
+    """
+    return np.tanh(x)
+
+
+class Neuron:
+    """a neuron of a Layer, its weights and output are the row and the value
+    at index of the arrays of the layer
+    """
+
+    def __init__(self, layer, index, inputs=None):
+        self.layer = layer
+        self.index = index
+        self.inputs = inputs or []
+
+    @property
+    def weights(self):
+        return self.layer.weights[self.index]
+
+    @weights.setter
+    def weights(self, weights):
+        self.layer.weights[self.index] = weights
+
+    @property
+    def output(self):
+        return float(self.layer.outputs[self.index])
+
+    @output.setter
+    def output(self, output):
+        self.layer.outputs[self.index] = output
+
+
+class Layer:
+    """dense layer, a (neurons, inputs) weight matrix, a bias vector and the
+    outputs of the last respond
+    """
+
+    def __init__(self, total, total_inputs, activation=sigmoid):
+        # random.random like the per neuron weights before, so seeded
+        # networks keep their weights
+        self.weights = np.array([-1.0 + random.random() * 2.0 for _ in range(total * total_inputs)])
+        self.weights = self.weights.reshape((total, total_inputs))
+        self.bias = np.zeros(total)
+        self.outputs = np.zeros(total)
+        self.activation = activation
+
+    def respond(self, inputs):
+        self.outputs = self.activation(self.weights.dot(inputs) + self.bias)
+        return self.outputs
+
+
+class Network:
+    """fully connected network, activation maps a numpy array of weighted
+    sums to the outputs of a layer and is not part of the json
+    """
+
+    def __init__(self, inputs, layers, outputs, activation=sigmoid):
+        self.total_inputs = inputs
+        self.total_layers = layers
+        self.total_outputs = outputs
+        self.activation = activation
+
+        self.input_layer = []
+        self.hidden_layers = []
+        self.output_layer = []
+        # the Layer of the inputs and the hidden and output Layers
+        self.inputs = None
+        self.layers = []
+
+    @classmethod
+    def from_json(cls, data, activation=sigmoid):
+        nw = cls(data['total_inputs'], data['total_layers'],
+                 data['total_outputs'], activation=activation)
+        nw.setup()
+        nw.import_weights(data['weights'])
+        return nw
+
+    def json(self):
+        return {
+            'total_inputs': copy.deepcopy(self.total_inputs),
+            'total_layers': copy.deepcopy(self.total_layers),
+            'total_outputs': copy.deepcopy(self.total_outputs),
+            'weights': self.export_weights()
+        }
+
+    def export_weights(self):
+        """flat list of the weights of every neuron, layer by layer
+        """
+        weights_list = []
+        for layer in self.layers:
+            weights_list += layer.weights.ravel().tolist()
+        return weights_list
+
+    def import_weights(self, weights):
+        """weights in the order of export_weights, the biases are not part
+        of them and keep their values
+        """
+        weights = np.asarray(weights, dtype=float)
+        start = 0
+        for layer in self.layers:
+            end = start + layer.weights.size
+            if end > len(weights):
+                raise ValueError('{} weights for a network of {}'.format(
+                    len(weights), sum(layer.weights.size for layer in self.layers)))
+            layer.weights[...] = weights[start:end].reshape(layer.weights.shape)
+            start = end
+
+    def clone(self):
+        """set up copy of the network, a network that is not set up yet
+        clones to one with random weights
+        """
+        cp = Network(self.total_inputs, list(self.total_layers),
+                     self.total_outputs, activation=self.activation)
+        cp.setup()
+        if self.inputs is None:
+            return cp
+        cp.inputs.outputs = np.copy(self.inputs.outputs)
+        for layer, cp_layer in zip(self.layers, cp.layers):
+            cp_layer.weights = np.copy(layer.weights)
+            cp_layer.bias = np.copy(layer.bias)
+            cp_layer.outputs = np.copy(layer.outputs)
+        return cp
+
+    def respond(self, data):
+        self.inputs.outputs = np.asarray(data, dtype=float)[:self.total_inputs]
+        outputs = self.inputs.outputs
+        for layer in self.layers:
+            outputs = layer.respond(outputs)
+        return outputs
+
+    def setup(self):
+        self.inputs = Layer(self.total_inputs, 0, self.activation)
+        self.input_layer = [Neuron(self.inputs, i) for i in range(self.total_inputs)]
+        self.layers = []
+        self.hidden_layers = []
+
+        prev_layer = self.input_layer
+        for layer_count in self.total_layers:
+            layer = Layer(layer_count, len(prev_layer), self.activation)
+            hidden_layer_i = [Neuron(layer, j, prev_layer) for j in range(layer_count)]
+            self.layers.append(layer)
+            self.hidden_layers.append(hidden_layer_i)
+            prev_layer = hidden_layer_i
+
+        layer = Layer(self.total_outputs, len(prev_layer), self.activation)
+        self.layers.append(layer)
+        self.output_layer = [Neuron(layer, i, prev_layer) for i in range(self.total_outputs)]
+
+
+class NetworkBatch:
+    """networks of the same shape stacked into (networks, neurons, inputs)
+    weight arrays, respond runs all of them with one matmul per layer
+
+    the weights are copied, a batch of networks whose weights change has to
+    be made again
+    """
+
+    def __init__(self, networks):
+        self.networks = list(networks)
+        shapes = set(tuple(layer.weights.shape for layer in network.layers) for network in self.networks)
+        if len(shapes) > 1:
+            raise ValueError('networks of different shapes {}'.format(sorted(shapes)))
+        activations = set(network.activation for network in self.networks)
+        if len(activations) > 1:
+            raise ValueError('networks of different activations {}'.format(activations))
+        self.activation = activations.pop() if activations else sigmoid
+        total_layers = len(self.networks[0].layers) if self.networks else 0
+        self.weights = [np.stack([network.layers[i].weights for network in self.networks])
+                        for i in range(total_layers)]
+        self.biases = [np.stack([network.layers[i].bias for network in self.networks])
+                       for i in range(total_layers)]
+
+    def respond(self, data, indices=None):
+        """(networks, outputs) outputs of the (networks, inputs) data, or
+        of the networks at indices only. The outputs of every layer are also
+        set on the networks, like Network.respond does.
+        """
+        weights, biases, networks = self.weights, self.biases, self.networks
+        if indices is not None:
+            weights = [layer_weights[indices] for layer_weights in weights]
+            biases = [layer_biases[indices] for layer_biases in biases]
+            networks = [networks[i] for i in indices]
+
+        outputs = np.asarray(data, dtype=float)
+        layer_outputs = [outputs]
+        for layer_weights, layer_biases in zip(weights, biases):
+            outputs = self.activation(np.matmul(layer_weights, outputs[:, :, None])[:, :, 0] + layer_biases)
+            layer_outputs.append(outputs)
+
+        for i, network in enumerate(networks):
+            network.inputs.outputs = layer_outputs[0][i]
+            for layer, outputs_i in zip(network.layers, layer_outputs[1:]):
+                layer.outputs = outputs_i[i]
+        return outputs
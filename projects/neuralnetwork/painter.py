@@ -0,0 +1,74 @@
+"""PySide2 drawing of a Network, kept out of the package import so
+networks train without Qt
+"""
+from PySide2.QtGui import QBrush
+from PySide2.QtGui import QColor
+from PySide2.QtGui import QPen
+
+
+class NetworkPainter:
+    def __init__(self, network):
+        self.draw_output_value = False
+        self.network = network
+        self.rect = None
+        self.neuron_pen = QPen()
+        self.neuron_brush = QBrush(QColor())
+
+    def get_neuron_size(self):
+        s = self.rect.width()
+        if self.rect.height() < s:
+            s = self.rect.height()
+        return s * 0.1
+
+    def paint(self, painter):
+
+        total_layers = len(self.network.hidden_layers) + 2
+        chunk_x = float(self.rect.width()) / (total_layers + 1)
+        layers = [self.network.input_layer] + self.network.hidden_layers + [
+            self.network.output_layer]
+
+        x = chunk_x
+        neuron_pos = {}
+        # draw neurons
+        painter.setPen(self.neuron_pen)
+        painter.setBrush(self.neuron_brush)
+        for i in range(total_layers):
+            layer = layers[i]
+            total_neurons = len(layer)
+            chunk_y = float(self.rect.height()) / (total_neurons + 1)
+            y = chunk_y
+            for j in range(total_neurons):
+                neuron = layer[j]
+                neuron_pos[neuron] = (x, y)
+                y += chunk_y
+
+            x += chunk_x
+
+        # draw connections
+        for layer in layers:
+            for neuron in layer:
+                x, y = neuron_pos[neuron]
+                for i, neuron_input in enumerate(neuron.inputs):
+                    w = neuron.weights[i]
+
+                    if w >= 0.0:
+                        c = QColor(0, 0, 100 * w)
+                    elif w < 0.0:
+                        c = QColor(w * -1.0 * 100, 0, 0)
+
+                    painter.setPen(QPen(c))
+                    input_x, input_y = neuron_pos[neuron_input]
+                    painter.drawLine(self.rect.x() + x, self.rect.y() + y, self.rect.x() + input_x, self.rect.y() + input_y)
+
+        n_size = self.get_neuron_size()
+        h_size = n_size / 2
+        for n, pos in neuron_pos.items():
+            x, y = pos
+            o = (n.output + 1.0) / 2.0
+            b = QBrush(QColor(o * 255, o * 255, o * 255))
+            p = QPen(QColor())
+            painter.setPen(p)
+            painter.setBrush(b)
+            painter.drawEllipse(self.rect.x() + x - h_size, self.rect.y() + y - h_size, n_size, n_size)
+            if self.draw_output_value:
+                painter.drawText(x, y - 20, str('{:.2f}'.format(n.output)))
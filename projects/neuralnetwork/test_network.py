@@ -0,0 +1,56 @@
+import unittest
+
+import numpy as np
+
+from neuralnetwork import Network, NetworkBatch
+
+
+class NetworkCloneTest(unittest.TestCase):
+    def test_clone_without_setup(self):
+        network = Network(3, [10, 10, 10], 3)
+        cp = network.clone()
+        self.assertIsNone(network.inputs)
+        self.assertEqual([layer.weights.shape for layer in cp.layers], [(10, 3), (10, 10), (10, 10), (3, 10)])
+        cp.respond([0.1, 0.2, 0.3])
+        self.assertEqual(len(cp.output_layer), 3)
+
+    def test_clone_copies_weights(self):
+        network = Network(3, [4], 2)
+        network.setup()
+        cp = network.clone()
+        self.assertEqual(cp.export_weights(), network.export_weights())
+        cp.layers[0].weights[0, 0] += 1.0
+        self.assertNotEqual(cp.export_weights(), network.export_weights())
+        data = np.array([0.1, 0.2, 0.3])
+        np.testing.assert_array_equal(network.clone().respond(data), network.respond(data))
+
+
+
+class NetworkBatchTest(unittest.TestCase):
+    def setUp(self):
+        self.networks = [Network(3, [4, 5], 2) for _ in range(6)]
+        for network in self.networks:
+            network.setup()
+        self.data = np.random.default_rng(0).random((6, 3))
+
+    def test_respond_equals_networks(self):
+        outputs = NetworkBatch(self.networks).respond(self.data)
+        expected = np.array([network.clone().respond(data) for network, data in zip(self.networks, self.data)])
+        np.testing.assert_array_equal(outputs, expected)
+        np.testing.assert_array_equal([network.layers[-1].outputs for network in self.networks], expected)
+
+    def test_respond_indices(self):
+        indices = [4, 1, 3]
+        outputs = NetworkBatch(self.networks).respond(self.data[indices], indices)
+        expected = np.array([self.networks[i].clone().respond(self.data[i]) for i in indices])
+        np.testing.assert_array_equal(outputs, expected)
+
+    def test_different_shapes(self):
+        other = Network(3, [4, 6], 2)
+        other.setup()
+        with self.assertRaises(ValueError):
+            NetworkBatch(self.networks + [other])
+
+
+if __name__ == '__main__':
+    unittest.main()